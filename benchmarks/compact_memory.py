@@ -0,0 +1,45 @@
+""" Compares the memory used per instance by the regular and compact classes
+
+Run from the repository root: python benchmarks/compact_memory.py
+"""
+import os
+import sys
+import tracemalloc
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import magical_universe
+import magical_universe_compact
+
+N = 100_000
+
+
+def bytes_per_instance(factory, n=N):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    instances = [factory(i) for i in range(n)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del instances
+    return (after - before) / n
+
+
+def factories(module):
+    yield 'CastleKilmereMember', lambda i: module.CastleKilmereMember('Bromley Huckabee', 1959, 'male')
+    yield 'Pupil', lambda i: module.Pupil('Luke Bery', 2008, 'male', 2020, ('Cotton', 'owl'))
+    yield 'Professor', lambda i: module.Professor('Blade Bardock', 1988, 'male', 'Potions')
+    yield 'Ghost', lambda i: module.Ghost('The Gray Groom', 1000, 'male', 1050)
+    yield 'Charm', lambda i: module.Charm('The Liberula charm', 'Liberula', 'Breathing under water')
+    yield 'Hex', lambda i: module.Hex('The Rectaro hex', 'Rectaro', 'Exchanges arms and legs')
+
+
+if __name__ == "__main__":
+    print(f"Bytes per instance, averaged over {N} instances")
+    print(f"{'class':<22}{'regular':>10}{'compact':>10}{'saved':>8}")
+
+    regular = factories(magical_universe)
+    compact = factories(magical_universe_compact)
+    for (name, make_regular), (_, make_compact) in zip(regular, compact):
+        regular_size = bytes_per_instance(make_regular)
+        compact_size = bytes_per_instance(make_compact)
+        saved = 1 - compact_size / regular_size
+        print(f"{name:<22}{regular_size:>10.0f}{compact_size:>10.0f}{saved:>8.0%}")
@@ -0,0 +1,74 @@
+""" Measures fuzzy incantation matching as the spell catalog grows
+
+Compares the trigram index of SpellCatalog.fuzzy(), which prefix-filters
+its candidates, with the same index counting every posting of the query
+and with a linear scan computing the same trigram similarity for every
+incantation.
+
+Run from the repository root: python benchmarks/fuzzy_matching.py [largest size]
+"""
+import os
+import sys
+import random
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from magical_universe import Charm, SpellCatalog, IncantationMatcher
+
+CONSONANTS = 'bcdfghklmnprstvz'
+VOWELS = 'aeiou'
+QUERIES = 200
+
+
+def incantation(rng):
+    words = [''.join(rng.choice(CONSONANTS) + rng.choice(VOWELS) for _ in range(rng.randint(2, 4)))
+             for _ in range(rng.randint(1, 3))]
+    return ' '.join(words).title()
+
+
+def misspell(text, rng):
+    i = rng.randrange(len(text))
+    return text[:i] + rng.choice('aeioumnrl') + text[i + 1:]
+
+
+def linear_scan(incantations, query, k=5):
+    grams = IncantationMatcher.trigrams(query)
+    scored = []
+    for candidate in incantations:
+        candidate_grams = IncantationMatcher.trigrams(candidate)
+        scored.append((2 * len(grams & candidate_grams) / (len(grams) + len(candidate_grams)),
+                       candidate))
+    return sorted(scored, reverse=True)[:k]
+
+
+def time_queries(catalog, queries):
+    start = time.perf_counter()
+    for query in queries:
+        catalog.fuzzy(query)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+if __name__ == "__main__":
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(42)
+
+    print(f"{'incantations':>12}{'index (us)':>12}{'count all (us)':>16}{'scan (us)':>12}")
+    size = 1_000
+    while size <= largest:
+        spells = [Charm(f"Charm {i}", incantation(rng), 'Does something') for i in range(size)]
+        catalog = SpellCatalog(spells)
+        queries = [misspell(rng.choice(spells).incantation, rng) for _ in range(QUERIES)]
+        catalog.fuzzy(queries[0])
+
+        index_time = time_queries(catalog, queries)
+        catalog._matcher.lookup_cost = sys.maxsize
+        count_time = time_queries(catalog, queries)
+
+        keys = [SpellCatalog.normalize(spell.incantation) for spell in spells]
+        start = time.perf_counter()
+        for query in queries[:10]:
+            linear_scan(keys, SpellCatalog.normalize(query))
+        scan_time = (time.perf_counter() - start) / 10 * 1e6
+
+        print(f"{size:>12}{index_time:>12.0f}{count_time:>16.0f}{scan_time:>12.0f}")
+        size *= 10
@@ -0,0 +1,59 @@
+""" Compares the cost per ingredient of iterating a Potion
+
+The legacy potion was its own iterator, keeping a shared counter on the
+instance. The current one hands out the iterator of its ingredient list.
+
+Run from the repository root: python benchmarks/potion_iteration.py [potions]
+"""
+import os
+import sys
+import timeit
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from magical_universe import Potion
+
+
+class LegacyPotion:
+    """ Potion as it was before it delegated to its ingredient list """
+    def __init__(self, ingredients):
+        self.ingredients = ingredients
+        self.counter = -1
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.counter += 1
+
+        if self.counter == len(self.ingredients):
+            raise StopIteration
+
+        return self.ingredients[self.counter]
+
+
+INGREDIENTS = ['raven eggshells', 'tincture of thyme', 'unicorn tears',
+               'dried onions', 'powdered ginger root']
+
+
+def iterate_all(potions):
+    for potion in potions:
+        for ingredient in potion:
+            pass
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    print(f"ns per ingredient, {n} potions of {len(INGREDIENTS)} ingredients")
+    print(f"{'potion':<10}{'ns':>8}")
+
+    timings = {}
+    for name, cls in (('legacy', LegacyPotion), ('current', Potion)):
+        # Legacy potions can only be iterated once, so every run gets fresh ones
+        timings[name] = min(timeit.repeat('iterate_all(potions)',
+                                          setup='potions = [cls(INGREDIENTS) for _ in range(n)]',
+                                          globals={**globals(), 'cls': cls, 'n': n},
+                                          number=1, repeat=5))
+        print(f"{name:<10}{timings[name] / (n * len(INGREDIENTS)) * 1e9:>8.1f}")
+
+    print(f"speedup: {timings['legacy'] / timings['current']:.1f}x")
@@ -0,0 +1,43 @@
+""" Compares the serial and the parallel shopping list
+
+Times shopping_list() against parallel_shopping_list() with a growing
+number of worker processes, on the same list of potions. The CPU time of
+the main process shows how much of the counting is left to it.
+
+Run from the repository root: python benchmarks/shopping_list.py [potions]
+"""
+import os
+import sys
+import random
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from magical_universe import Potion, shopping_list, parallel_shopping_list
+
+INGREDIENTS = [f"ingredient {i}" for i in range(500)]
+
+
+def timed(function, *args, **kwargs):
+    start, start_cpu = time.perf_counter(), time.process_time()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, time.process_time() - start_cpu, result
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 250_000
+    rng = random.Random(42)
+    potions = [Potion(rng.choices(INGREDIENTS, k=rng.randint(4, 12))) for _ in range(n)]
+    ingredients = sum(map(len, potions))
+    shopping_list(potions)
+
+    print(f"{n} potions, {ingredients} ingredients, {os.cpu_count()} CPUs")
+    print(f"{'workers':<10}{'seconds':>10}{'main CPU':>10}{'speedup':>10}")
+
+    serial, serial_cpu, expected = timed(shopping_list, potions)
+    print(f"{'serial':<10}{serial:>10.2f}{serial_cpu:>10.2f}{1:>10.1f}")
+    workers = 1
+    while workers <= 2 * (os.cpu_count() or 1):
+        seconds, cpu, result = timed(parallel_shopping_list, potions, workers=workers)
+        assert result == expected
+        print(f"{workers:<10}{seconds:>10.2f}{cpu:>10.2f}{serial / seconds:>10.1f}")
+        workers *= 2
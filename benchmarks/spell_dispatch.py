@@ -0,0 +1,80 @@
+""" Compares SpellKind table dispatch with the old class-name comparisons
+
+Replays the learn_spell / cast_spell scenarios of test_pupil_class.py
+many times with events going to a NullSink.
+
+Run from the repository root: python benchmarks/spell_dispatch.py [calls]
+"""
+import os
+import sys
+import timeit
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from magical_universe import (Pupil, Charm, Hex, Curse, Outcome, NullSink, event_sink,
+                              school_clock, _emit)
+
+
+def learn_spell_by_class_name(pupil, spell):
+    """ learn_spell as it was before the SpellKind dispatch table """
+    if spell.min_year is not None:
+        if pupil.current_year >= spell.min_year:
+            pupil.known_spells.add(spell)
+            return _emit(Outcome.LEARNED, pupil, spell)
+        elif pupil.exhibits_trait('highly intelligent'):
+            pupil.known_spells.add(spell)
+            return _emit(Outcome.LEARNED, pupil, spell)
+        elif pupil.current_year < spell.min_year:
+            return _emit(Outcome.TOO_YOUNG, pupil, spell)
+
+    elif spell.__class__.__name__ in ['Hex', 'Curse']:
+        if pupil.exhibits_trait('evil'):
+            pupil.known_spells.add(spell)
+            return _emit(Outcome.LEARNED, pupil, spell)
+        else:
+            return _emit(Outcome.DARK_STUDY_REFUSED, pupil, spell)
+
+
+def cast_spell_by_class_name(pupil, spell):
+    """ cast_spell as it was before the SpellKind dispatch table """
+    if spell.__class__.__name__ == 'Curse':
+        return _emit(Outcome.CURSE_REFUSED, pupil, spell)
+    elif spell.__class__.__name__ == 'Hex':
+        if not pupil.exhibits_trait('evil'):
+            return _emit(Outcome.HEX_REFUSED, pupil, spell)
+    elif spell in pupil.known_spells:
+        return f"{pupil.name}: {spell.incantation}!"
+    elif spell.name not in pupil.known_spells:
+        return _emit(Outcome.NOT_STUDIED, pupil, spell)
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    luke = Pupil.luke()
+    lissy = Pupil.lissy()
+    lissy.add_trait('highly intelligent')
+    stuporus_ratiato = Charm.stuporus_ratiato()
+
+    scenarios = {
+        'learn hex, not evil': ('learn', luke, Hex.rectaro()),
+        'learn charm, too young': ('learn', luke, Charm.liberula()),
+        'learn charm, intelligent': ('learn', lissy, Charm.liberula()),
+        'learn charm': ('learn', luke, stuporus_ratiato),
+        'cast curse': ('cast', luke, Curse.fiera_satanotis()),
+        'cast hex': ('cast', luke, Hex.rectaro()),
+        'cast known charm': ('cast', luke, stuporus_ratiato),
+    }
+    implementations = {'learn': (learn_spell_by_class_name, Pupil.learn_spell),
+                       'cast': (cast_spell_by_class_name, Pupil.cast_spell)}
+
+    print(f"ns per call, {calls} calls per scenario")
+    print(f"{'scenario':<28}{'class name':>12}{'kind table':>12}{'speedup':>9}")
+
+    with school_clock(year=2021), event_sink(NullSink()):
+        luke.learn_spell(stuporus_ratiato)
+        for scenario, (action, pupil, spell) in scenarios.items():
+            old, new = implementations[action]
+            old_time = min(timeit.repeat(lambda: old(pupil, spell), number=calls // 5, repeat=5)) * 5
+            new_time = min(timeit.repeat(lambda: new(pupil, spell), number=calls // 5, repeat=5)) * 5
+            print(f"{scenario:<28}{old_time / calls * 1e9:>12.0f}"
+                  f"{new_time / calls * 1e9:>12.0f}{old_time / new_time:>8.2f}x")
@@ -0,0 +1,82 @@
+""" Compares load_roster with loading config.yaml-style files member by member
+
+The per-entry approach is the one of code_per_day/day_49_to_50.py: parse
+the whole file with the pure Python loader, then call the class of every
+entry with its attributes. The cached column times a second load_roster,
+which reads the compiled cache written by the first one.
+
+Run from the repository root: python benchmarks/yaml_roster.py [entries]
+"""
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import yaml
+
+from magical_universe import CastleKilmereMember, Pupil, Professor, Ghost, load_roster
+
+CLASSES = {'member': CastleKilmereMember, 'pupil': Pupil, 'professor': Professor, 'ghost': Ghost}
+
+
+def entry(i):
+    kind = ('member', 'pupil', 'pupil', 'professor', 'ghost')[i % 5]
+    attributes = {'type': kind, 'name': f"Member {i}", 'birthyear': 1950 + i % 60,
+                  'sex': ('male', 'female')[i % 2]}
+    if kind == 'pupil':
+        attributes.update(start_year=2020, pet=['Cotton', 'owl'])
+    elif kind == 'professor':
+        attributes['subject'] = 'Potions'
+    elif kind == 'ghost':
+        attributes['year_of_death'] = 1050
+    return attributes
+
+
+def write_roster(path, n, documents):
+    """ Writes n entries, either as one mapping or as documents of 1000 entries """
+    with open(path, 'w') as f:
+        if documents:
+            for start in range(0, n, 1000):
+                yaml.safe_dump([entry(i) for i in range(start, min(start + 1000, n))], f,
+                               explicit_start=True)
+        else:
+            yaml.safe_dump({f"member_{i}": entry(i) for i in range(n)}, f)
+
+
+def load_per_entry(path):
+    with open(path, 'r') as c:
+        config = yaml.load(c, Loader=yaml.SafeLoader)
+    members = []
+    for attributes in config.values():
+        cls = CLASSES[attributes.pop('type')]
+        if cls is Pupil:
+            attributes['pet'] = tuple(attributes['pet'])
+        members.append(cls(**attributes))
+    return members
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    print(f"Seconds to load {n} members, C loader available: {hasattr(yaml, 'CSafeLoader')}")
+    print(f"{'file':<14}{'per entry':>11}{'load_roster':>13}{'cached':>9}{'speedup':>9}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for layout, documents in (('one mapping', False), ('documents', True)):
+            path = os.path.join(directory, f"{layout}.yaml")
+            write_roster(path, n, documents)
+            roster_time, roster = timed(load_roster, path)
+            cached_time, cached = timed(load_roster, path)
+            assert len(roster) == len(cached) == n
+            if documents:
+                print(f"{layout:<14}{'-':>11}{roster_time:>13.2f}{cached_time:>9.4f}")
+                continue
+            per_entry_time, members = timed(load_per_entry, path)
+            print(f"{layout:<14}{per_entry_time:>11.2f}{roster_time:>13.2f}{cached_time:>9.4f}"
+                  f"{per_entry_time / roster_time:>8.1f}x")
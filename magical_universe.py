@@ -1,10 +1,497 @@
+import asyncio
+import atexit
+import bisect
 import datetime
 import functools
-
+import hashlib
+import heapq
+import itertools
+import marshal
+import math
+import mmap
+import multiprocessing
+import operator
+import os
+import random
+import struct
+import sys
+import threading
+import time
+import weakref
+
+from enum import IntEnum
 from typing import NamedTuple
+from array import array
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from collections import defaultdict
+from dataclasses import dataclass, FrozenInstanceError
+from contextlib import contextmanager, suppress
+from collections import Counter, deque
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+class SchoolClock:
+    """ Tells all date-dependent properties which year it is
+
+    The wall clock year is cached until the next New Year, so reading it
+    costs a cheap timestamp comparison. The clock can be pinned to a fixed
+    year, either process-wide with pin() or temporarily:
+
+        with school_clock(year=2026):
+            ...
+    """
+    def __init__(self):
+        self._pinned = None
+        self._year = None
+        self._expires = float('-inf')
+
+    @property
+    def year(self) -> int:
+        if self._pinned is not None:
+            return self._pinned
+        if time.time() >= self._expires:
+            now = datetime.datetime.now()
+            self._year = now.year
+            self._expires = datetime.datetime(now.year + 1, 1, 1).timestamp()
+        return self._year
+
+    @property
+    def pinned(self) -> bool:
+        return self._pinned is not None
+
+    def pin(self, year: int = None):
+        """ Fixes the year, by default to the current one """
+        self._pinned = self.year if year is None else year
+
+    def unpin(self):
+        self._pinned = None
+
+    @contextmanager
+    def __call__(self, year: int = None):
+        previous = self._pinned
+        self.pin(year)
+        try:
+            yield self._pinned
+        finally:
+            self._pinned = previous
+
+
+school_clock = SchoolClock()
+
+
+# Rendered utterances repeat a lot, so they are cached
+UTTERANCE_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=UTTERANCE_CACHE_SIZE)
+def _said(name: str, words: str) -> str:
+    return f"{name} says: {words}"
+
+
+@functools.lru_cache(maxsize=UTTERANCE_CACHE_SIZE)
+def _whispered(said: str) -> str:
+    """ Turns the output of a says-like method into whispering """
+    first_part, words = said.split(' says: ')
+    return f"{first_part} whispers: {words.replace('!', '.')}.."
+
+
+@functools.lru_cache(maxsize=UTTERANCE_CACHE_SIZE)
+def _incantation_shout(incantation: str) -> str:
+    return f"{incantation}!"
+
+
+@functools.lru_cache(maxsize=UTTERANCE_CACHE_SIZE)
+def _spell_cast_by(name: str, incantation: str) -> str:
+    return f"{name}: {incantation}!"
+
+
+_UTTERANCE_CACHES = {'says': _said,
+                     'whispers': _whispered,
+                     'spell cast': _incantation_shout,
+                     'pupil cast': _spell_cast_by}
+
+
+def utterance_cache_info() -> dict:
+    """ Hits, misses and size of every utterance cache """
+    return {name: cache.cache_info() for name, cache in _UTTERANCE_CACHES.items()}
+
+
+def clear_utterance_caches():
+    for cache in _UTTERANCE_CACHES.values():
+        cache.cache_clear()
+
+
+class TraitVocabulary:
+    """ Interns trait names, giving every trait one bit of a trait mask """
+    def __init__(self):
+        self._bits = {}
+        self._traits = []
+
+    def bit(self, trait: str) -> int:
+        """ Returns the bit of a trait, adding the trait if it is new """
+        try:
+            return self._bits[trait]
+        except KeyError:
+            bit = self._bits[trait] = 1 << len(self._traits)
+            self._traits.append(trait)
+            return bit
+
+    def lookup(self, trait: str) -> int:
+        """ Returns the bit of a trait, or 0 for traits nobody has yet """
+        return self._bits.get(trait, 0)
+
+    def mask(self, traits) -> int:
+        """ Combines the bits of several traits, 0 if any of them is unknown """
+        mask = 0
+        for trait in traits:
+            bit = self._bits.get(trait, 0)
+            if not bit:
+                return 0
+            mask |= bit
+        return mask
+
+    def traits(self, mask: int) -> list:
+        """ Returns the names of the traits set in a mask """
+        names = []
+        while mask:
+            lowest = mask & -mask
+            names.append(self._traits[lowest.bit_length() - 1])
+            mask ^= lowest
+        return names
+
+    def __contains__(self, trait: str) -> bool:
+        return trait in self._bits
+
+    def __len__(self) -> int:
+        return len(self._traits)
+
+
+trait_vocabulary = TraitVocabulary()
+
+
+class Outcome(IntEnum):
+    """ Result codes of pupil actions """
+    LEARNED = 1
+    TOO_YOUNG = 2
+    DARK_STUDY_REFUSED = 3
+    CURSE_REFUSED = 4
+    HEX_REFUSED = 5
+    NOT_STUDIED = 6
+    BEFRIENDED = 7
+    ELM_AWARDED = 8
+    ELM_NOT_AWARDED = 9
+    ELMS_DELETED = 10
+    ALREADY_FRIENDS = 11
+    HEX_CAST = 12
+    NOT_LEARNABLE = 13
+
+
+# What the default PrintSink prints for each outcome, None means nothing
+_MESSAGES = {
+        Outcome.LEARNED: "{member.name} now knows '{subject.name}'",
+        Outcome.TOO_YOUNG: "{member.name} is too young to study this spell!",
+        Outcome.DARK_STUDY_REFUSED: "How dare you study a hex or curse?!",
+        Outcome.CURSE_REFUSED: "This is dark magic - stay away from performing curses!",
+        Outcome.HEX_REFUSED: "You shouldn't cast a hex, that's mean!",
+        Outcome.NOT_STUDIED: ("You can't cast the {subject.name} spell correctly "
+                              " - you have to study it first! "),
+        Outcome.BEFRIENDED: "{subject.name} is now your friend!",
+        Outcome.ELM_AWARDED: None,
+        Outcome.ELM_NOT_AWARDED: "The exam was not passed so no ELM was awarded!",
+        Outcome.ELMS_DELETED: ("Caution, you are deleting this students' ELM's! "
+                               "You should only do that if she/he dropped out of "
+                               "school without passing any exam!"),
+        Outcome.ALREADY_FRIENDS: "{subject.name} is already your friend!",
+        Outcome.HEX_CAST: None,
+        Outcome.NOT_LEARNABLE: None,
+        }
+
+
+class Event(NamedTuple):
+    """ Something that happened to a member, e.g. a spell was learned """
+    outcome: Outcome
+    member: 'CastleKilmereMember'
+    subject: object = None
+
+    @property
+    def message(self) -> str:
+        template = _MESSAGES[self.outcome]
+        if template is None:
+            return None
+        return template.format(member=self.member, subject=self.subject)
+
+
+class EventSink(ABC):
+    """ Receives the events emitted by pupils """
+    @abstractmethod
+    def emit(self, event: Event):
+        pass
+
+
+class PrintSink(EventSink):
+    """ Prints the message of every event, the default behaviour """
+    def emit(self, event: Event):
+        message = event.message
+        if message is not None:
+            print(message)
+
+
+class NullSink(EventSink):
+    """ Drops all events """
+    def emit(self, event: Event):
+        pass
+
+
+class RingBufferSink(EventSink):
+    """ Keeps the most recent events in memory """
+    def __init__(self, capacity: int = 10_000):
+        self.events = deque(maxlen=capacity)
+
+    def emit(self, event: Event):
+        self.events.append(event)
+
+
+# Buffering sinks and writers that have not been closed, flushed when the interpreter exits
+_open_buffers = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_open_buffers():
+    for buffer in list(_open_buffers):
+        buffer.flush()
+
+
+class BatchedFileSink(EventSink):
+    """ Appends event messages to a file, writing them in batches
+
+    A partial batch is written on flush(), when leaving a with-block, or
+    when the interpreter exits.
+    """
+    def __init__(self, path, batch_size: int = 1000):
+        self.path = path
+        self.batch_size = batch_size
+        self._batch = []
+        self._lock = threading.Lock()
+        _open_buffers.add(self)
+
+    def emit(self, event: Event):
+        message = event.message
+        if message is None:
+            message = f"{event.member.name}: {event.outcome.name}"
+        with self._lock:
+            self._batch.append(message)
+            if len(self._batch) >= self.batch_size:
+                self._write()
+
+    def _write(self):
+        with open(self.path, 'a') as f:
+            f.write('\n'.join(self._batch) + '\n')
+        self._batch.clear()
+
+    def flush(self):
+        with self._lock:
+            if self._batch:
+                self._write()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+
+_event_sink = PrintSink()
+
+
+def set_event_sink(sink: EventSink) -> EventSink:
+    """ Sends all events to `sink` from now on, returns the previous sink """
+    global _event_sink
+    previous, _event_sink = _event_sink, sink
+    return previous
+
+
+@contextmanager
+def event_sink(sink: EventSink):
+    """ Sends all events to `sink` within a with-block """
+    previous = set_event_sink(sink)
+    try:
+        yield sink
+    finally:
+        set_event_sink(previous)
+
+
+def _emit(outcome: Outcome, member, subject=None) -> Outcome:
+    _event_sink.emit(Event(outcome, member, subject))
+    return outcome
+
+
+class _FriendshipNode:
+    """ A member's place in a FriendshipGraph, stored on the member itself
+
+    The member keeps its friends alive, the graph only refers to members
+    weakly, so pupils nobody befriended can be garbage collected.
+    """
+    __slots__ = ('graph', 'node', 'friends')
+
+    def __init__(self, graph: 'FriendshipGraph', node: int):
+        self.graph = graph
+        self.node = node
+        self.friends = []
+
+
+class FriendshipGraph:
+    """ Friendships between members, stored with integer node ids
+
+    A member becomes a node the first time it takes part in a friendship.
+    Each node keeps the ids of its friends in an insertion-ordered dict,
+    so duplicate checks are O(1). Friendships are directed (befriending
+    someone does not make you their friend), but degrees of separation
+    and connected components treat them as undirected.
+
+    Members are held weakly: when a member is garbage collected its node
+    is dropped and its id reused. A member belongs to one graph at a time.
+    Anything else with a name (dark army members, roster rows) can take
+    part too; the graph keeps those alive itself.
+    """
+    def __init__(self):
+        self._members = []
+        self._friends = []
+        self._befriended_by = []
+        self._free = []
+        # Nodes of participants without a _friendship_node attribute, by id()
+        self._others = {}
+
+    def _stored(self, member) -> _FriendshipNode:
+        try:
+            return member._friendship_node
+        except AttributeError:
+            return self._others.get(id(member))
+
+    def _place(self, member) -> _FriendshipNode:
+        """ Returns the node of a member, adding the member if needed """
+        place = self._stored(member)
+        if place is not None:
+            if place.graph is not self:
+                raise ValueError(f"{member.name} is already part of another friendship graph")
+            return place
+
+        node = self._free.pop() if self._free else len(self._members)
+        if node == len(self._members):
+            self._members.append(None)
+            self._friends.append(None)
+            self._befriended_by.append(None)
+        self._friends[node] = {}
+        self._befriended_by[node] = set()
+        place = _FriendshipNode(self, node)
+        if hasattr(member, '_friendship_node'):
+            self._members[node] = weakref.ref(member, lambda _, node=node: self._drop(node))
+            member._friendship_node = place
+        else:
+            self._members[node] = lambda: member
+            self._others[id(member)] = place
+        return place
+
+    def _find(self, member) -> _FriendshipNode:
+        place = self._stored(member)
+        return place if place is not None and place.graph is self else None
+
+    def _drop(self, node: int):
+        for friend in self._friends[node]:
+            self._befriended_by[friend].discard(node)
+        for follower in self._befriended_by[node]:
+            self._friends[follower].pop(node, None)
+        self._members[node] = self._friends[node] = self._befriended_by[node] = None
+        self._free.append(node)
+
+    def node(self, member) -> int:
+        """ Returns the node id of a member, adding the member if needed """
+        return self._place(member).node
+
+    def befriend(self, member, friend) -> bool:
+        """ Adds a friendship, returns False if it already existed """
+        place, friend_node = self._place(member), self._place(friend).node
+        friends = self._friends[place.node]
+        if friend_node in friends:
+            return False
+        friends[friend_node] = None
+        place.friends.append(friend)
+        self._befriended_by[friend_node].add(place.node)
+        return True
+
+    def friends_of(self, member) -> list:
+        place = self._find(member)
+        return list(place.friends) if place is not None else []
+
+    def are_friends(self, member, friend) -> bool:
+        place, friend_place = self._find(member), self._find(friend)
+        return (place is not None and friend_place is not None
+                and friend_place.node in self._friends[place.node])
+
+    def mutual_friends(self, member, other) -> list:
+        """ Members that both `member` and `other` befriended """
+        place, other_place = self._find(member), self._find(other)
+        if place is None or other_place is None:
+            return []
+        other_friends = self._friends[other_place.node]
+        return [friend for friend in place.friends
+                if self._find(friend).node in other_friends]
+
+    def _neighbours(self, node: int):
+        return itertools.chain(self._friends[node], self._befriended_by[node])
+
+    def degrees_of_separation(self, member, other) -> int:
+        """ Fewest friendships linking two members, None if they are not linked """
+        if member is other:
+            return 0
+        place, other_place = self._find(member), self._find(other)
+        if place is None or other_place is None:
+            return None
+        start, goal = place.node, other_place.node
+
+        distance = {start: 0}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            for neighbour in self._neighbours(node):
+                if neighbour not in distance:
+                    if neighbour == goal:
+                        return distance[node] + 1
+                    distance[neighbour] = distance[node] + 1
+                    queue.append(neighbour)
+        return None
+
+    def connected_components(self) -> list:
+        """ Groups of members linked by friendships, largest first """
+        seen = bytearray(len(self._members))
+        components = []
+        for start, member in enumerate(self._members):
+            if seen[start] or member is None:
+                continue
+            seen[start] = 1
+            component = [start]
+            for node in component:
+                for neighbour in self._neighbours(node):
+                    if not seen[neighbour]:
+                        seen[neighbour] = 1
+                        component.append(neighbour)
+            components.append([self._members[node]() for node in component])
+        return sorted(components, key=len, reverse=True)
+
+    def clear(self):
+        for reference in self._members:
+            member = reference() if reference is not None else None
+            if member is not None and hasattr(member, '_friendship_node'):
+                member._friendship_node = None
+        self.__init__()
+
+    def __contains__(self, member) -> bool:
+        return self._find(member) is not None
+
+    def __len__(self) -> int:
+        return len(self._members) - len(self._free)
+
+
+school_friendships = FriendshipGraph()
+
 
 class CastleKilmereMember:
     """Creates a member of the Castle Kilmere School of Magic"""
@@ -12,30 +499,61 @@ class CastleKilmereMember:
         self.name = name
         self.birthyear = birthyear
         self.sex = sex
-        self._traits = defaultdict(lambda: False)
+        self._trait_mask = 0
+        self._false_mask = 0
+        # Traits in the order they were first added, created with the first trait
+        self._trait_order = None
+        self._trait_index = None
+        self._friendship_node = None
+
+    def __getstate__(self):
+        """ Copies and pickles leave the friendship graph and trait index behind """
+        state = dict(self.__dict__)
+        state['_trait_index'] = state['_friendship_node'] = None
+        return state
 
     def write_letter(self, recipient, content):
-        letter_name = f"dear_{recipient}.txt"
-        with Letter(letter_name) as l:
-            l.write(content)
+        _letter_writer.write(recipient, content)
+
+    async def awrite_letter(self, recipient, content):
+        """ Writes a letter without blocking the event loop """
+        if _owl_post is None:
+            await asyncio.get_running_loop().run_in_executor(None, self.write_letter, recipient, content)
+        else:
+            await (await _owl_post.send(recipient, content))
 
     def whisper(function):
+        """ Turns a says-like method into whispering """
         @functools.wraps(function)
         def wrapper(self, *args):
             ''' Whispering decorator '''
-            original_output = function(self, *args)
-            first_part, words = original_output.split(' says: ')
-            words = words.replace('!', '.')
-            new_output = f"{first_part} whispers: {words}.."
-            return new_output
+            return _whispered(function(self, *args))
         return wrapper
 
     def says(self, words: str) -> str:
         '''Allows a Castle Kilmere Member to talk'''
-        return f"{self.name} says: {words}"
+        return _said(self.name, words)
 
     def add_trait(self, trait, value=True):
-        self._traits[trait] = value
+        bit = trait_vocabulary.bit(trait)
+        if not (self._trait_mask | self._false_mask) & bit:
+            if self._trait_order is None:
+                self._trait_order = []
+            self._trait_order.append(trait)
+        if value:
+            self._trait_mask |= bit
+            self._false_mask &= ~bit
+        else:
+            self._false_mask |= bit
+            self._trait_mask &= ~bit
+
+        if self._trait_index is not None:
+            self._trait_index.update(self, trait, bool(value))
+
+    @property
+    def _traits(self) -> dict:
+        return {trait: bool(self._trait_mask & trait_vocabulary.lookup(trait))
+                for trait in self._trait_order or ()}
 
     def print_traits(self):
         true_traits = [trait for trait, value in self._traits.items() if value]
@@ -49,12 +567,11 @@ class CastleKilmereMember:
             print(f"{self.name} does not have traits yet.")
 
     def exhibits_trait(self, trait: str) -> bool:
-        value = self._traits[trait]
-        return value
+        return bool(self._trait_mask & trait_vocabulary.lookup(trait))
 
     @property
     def age(self) -> int:
-        now = datetime.datetime.now().year
+        now = school_clock.year
         return now - self.birthyear
 
     @classmethod
@@ -101,7 +618,7 @@ class Ghost(CastleKilmereMember):
 
     @property
     def age(self) -> int:
-        now = datetime.datetime.now().year
+        now = school_clock.year
         return now - self.birthyear
 
     def __repr__(self) -> str:
@@ -130,8 +647,33 @@ class Ghost(CastleKilmereMember):
         return cls("The Boneless Bard", 1211, 'male', 1288)
 
 
+_PASSING_GRADES = {
+        'E': True,
+        'Excellent': True,
+        'G': True,
+        'Good': True,
+        'A': True,
+        'Acceptable': True,
+        'P': False,
+        'Poor': False,
+        'H': False,
+        'Horrible': False,
+        }
+
+
 class Pupil(CastleKilmereMember):
     """ Create a Castle Kilmere Pupil """
+    elm_subjects = ('Critical Thinking',
+                    'Self-Defense Against Fresh Fruit',
+                    'Broomstick Flying',
+                    'Magical Theory',
+                    'Foreign Magical Systems',
+                    'Charms',
+                    'Defence Against Dark Magic',
+                    'History of Magic',
+                    'Potions',
+                    'Transfiguration')
+    _elm_bits = {subject: 1 << i for i, subject in enumerate(elm_subjects)}
 
     def __init__(self, name: str, birthyear: int, sex: str, start_year: int, pet: tuple = None):
         super().__init__(name, birthyear, sex)
@@ -141,19 +683,7 @@ class Pupil(CastleKilmereMember):
         if pet is not None:
             self.pet_name, self.pet_type = pet
 
-        self._elms = {
-                  'Critical Thinking': False,
-                  'Self-Defense Against Fresh Fruit': False,
-                  'Broomstick Flying': False,
-                  'Magical Theory': False,
-                  'Foreign Magical Systems': False,
-                  'Charms': False,
-                  'Defence Against Dark Magic': False,
-                  'History of Magic': False,
-                  'Potions': False,
-                  'Transfiguration': False}
-
-        self._friends = []
+        self._elm_mask = 0
 
     @classmethod
     def luke(cls):
@@ -169,16 +699,22 @@ class Pupil(CastleKilmereMember):
 
     @property
     def current_year(self) -> int:
-        now = datetime.datetime.now().year
+        now = school_clock.year
         return (now - self.start_year) + 1
 
+    @property
+    def _elms(self) -> 'ElmView':
+        self._elm_mask  # raises AttributeError once the ELMs were deleted
+        return ElmView(self)
+
     @property
     def elms(self):
         return self._elms
 
     @property
     def friends(self):
-        return f"{self.name}'s current friends are: {[person.name for person in self._friends]}"
+        friends = school_friendships.friends_of(self)
+        return f"{self.name}'s current friends are: {[person.name for person in friends]}"
 
     @elms.setter
     def elms(self, subject_and_grade):
@@ -187,96 +723,196 @@ class Pupil(CastleKilmereMember):
         except ValueError:
             raise ValueError("Pass and iterable with two items: subject and grade")
 
-        passed = self.passed(grade)
+        bit = self._elm_bits[subject]
 
-        if passed:
-            self._elms[subject] = True
+        if _PASSING_GRADES.get(grade, False):
+            self._elm_mask |= bit
+            _emit(Outcome.ELM_AWARDED, self, subject)
         else:
-            print('The exam was not passed so no ELM was awarded!')
+            _emit(Outcome.ELM_NOT_AWARDED, self, subject)
 
     @elms.deleter
     def elms(self):
-        print("Caution, you are deleting this students' ELM's! "
-              "You should only do that if she/he dropped out of school without passing any exam!")
-        del self._elms
-
+        _emit(Outcome.ELMS_DELETED, self)
+        del self._elm_mask
 
     @staticmethod
     def passed(grade):
         """ Given a grade, determine if an exam was passed.  """
-        grades = {
-                'E': True,
-                'Excellent': True,
-                'G': True,
-                'Good': True,
-                'A': True,
-                'Acceptable': True,
-                'P': False,
-                'Poor': False,
-                'H': False,
-                'Horrible': False,
-                }
-
-        return grades.get(grade, False)
-
-    def befriend(self, person):
+        return _PASSING_GRADES.get(grade, False)
+
+    def befriend(self, person) -> Outcome:
         """Adds another person to your list of friends"""
-        self._friends.append(person)
-        print(f"{person.name} is now your friend!")
+        if not school_friendships.befriend(self, person):
+            return _emit(Outcome.ALREADY_FRIENDS, self, person)
+        return _emit(Outcome.BEFRIENDED, self, person)
 
     def __repr__(self) -> str:
         return (f"{self.__class__.__name__}(name='{self.name}', "
                 f"birthyear={self.birthyear}, sex='{self.sex}', "
                 f"start_year={self.start_year})")
 
-    def learn_spell(self, spell: 'Spell'):
+    def learn_spell(self, spell: 'Spell') -> Outcome:
         """ Allows a pupil to learn a spell, given that he/she is old enough """
-        if spell.min_year is not None:
-            if self.current_year >= spell.min_year:
-                print(f"{self.name} now knows '{spell.name}'")
-                self.known_spells.add(spell)
+        return _LEARN_POLICIES[spell.kind](self, spell)
 
-            elif self.exhibits_trait('highly intelligent'):
-                print(f"{self.name} now knows '{spell.name}'")
-                self.known_spells.add(spell)
+    def cast_spell(self, spell: 'Spell'):
+        """ Allows a pupil to cast a spell
 
-            elif self.current_year < spell.min_year:
-                print(f"{self.name} is too young to study this spell!")
+        Returns what the pupil says, or an Outcome for curses and hexes and
+        spells that were not cast.
+        """
+        return _CAST_POLICIES[spell.kind](self, spell)
 
-        elif spell.__class__.__name__ in ['Hex', 'Curse']:
-            # Only evil pupils would study hexes and curses
-            if self.exhibits_trait('evil'):
-                print(f"{self.name} now knows '{spell.name}'")
-                self.known_spells.add(spell)
 
-            else:
-                print(f"How dare you study a hex or curse?!")
+class ElmView(Mapping):
+    """ Dict-like view of a pupil's ELMs, backed by the pupil's ELM bitmask
 
-    def cast_spell(self, spell: 'Spell'):
-        """ Allows a pupil to cast a spell """
-        if spell.__class__.__name__ == 'Curse':
-            print("This is dark magic - stay away from performing curses!")
+    Setting a subject to True or False awards or removes the ELM.
+    """
+    __slots__ = ('_pupil',)
+
+    def __init__(self, pupil: Pupil):
+        self._pupil = pupil
+
+    def __getitem__(self, subject: str) -> bool:
+        return bool(self._pupil._elm_mask & self._pupil._elm_bits[subject])
+
+    def __setitem__(self, subject: str, value: bool):
+        bit = self._pupil._elm_bits[subject]
+        if value:
+            self._pupil._elm_mask |= bit
+        else:
+            self._pupil._elm_mask &= ~bit
+
+    def __iter__(self):
+        return iter(self._pupil.elm_subjects)
+
+    def __len__(self) -> int:
+        return len(self._pupil.elm_subjects)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+def grade_cohort(pupils, subject: str, grades) -> int:
+    """ Applies the exam results of a whole cohort in one subject
+
+    `grades` holds one grade per pupil, in the same order. Returns the
+    number of passed exams. Unlike the elms setter nothing is printed.
+    """
+    bit = Pupil._elm_bits[subject]
+    passing = _PASSING_GRADES
+    awarded = 0
+
+    if len(pupils) != len(grades):
+        raise ValueError("Pass one grade per pupil")
+    for pupil, grade in zip(pupils, grades):
+        if passing.get(grade, False):
+            pupil._elm_mask |= bit
+            awarded += 1
+    return awarded
+
+
+class SpellKind(IntEnum):
+    """ Tags every spell class, used to look up how pupils learn and cast it """
+    OTHER = 0
+    CHARM = 1
+    TRANSFIGURATION = 2
+    JINX = 3
+    HEX = 4
+    CURSE = 5
+    COUNTER_SPELL = 6
+    HEALING_SPELL = 7
+
+
+class SpellRegistry:
+    """ Hands out one shared instance per canonical spell
+
+    Spells are keyed by their class and name.
+    """
+    def __init__(self):
+        self._spells = {}
+        self._constructed = {}
+
+    def intern(self, spell: 'Spell') -> 'Spell':
+        """ Returns the registered spell equal to `spell`, registering it if new """
+        return self._spells.setdefault((type(spell), spell.name), spell)
+
+    def construct(self, cls, constructor) -> 'Spell':
+        """ Calls a spell classmethod once per class, then reuses the result """
+        key = (cls, constructor.__name__)
+        try:
+            return self._constructed[key]
+        except KeyError:
+            spell = self._constructed[key] = self.intern(constructor(cls))
+            return spell
+
+    def get(self, spell_class, name: str, default=None) -> 'Spell':
+        return self._spells.get((spell_class, name), default)
+
+    def __contains__(self, spell) -> bool:
+        return self._spells.get((type(spell), spell.name)) == spell
+
+    def __iter__(self):
+        return iter(self._spells.values())
+
+    def __len__(self) -> int:
+        return len(self._spells)
 
-        elif spell.__class__.__name__ == 'Hex':
-            if not self.exhibits_trait('evil'):
-                print(f"You shouldn't cast a hex, that's mean!")
 
-        elif spell in self.known_spells:
-            return f"{self.name}: {spell.incantation}!"
+spell_registry = SpellRegistry()
 
-        elif spell.name not in self.known_spells:
-            print(f"You can't cast the {spell.name} spell correctly "
-                  f" - you have to study it first! ")
+
+def canonical_spell(constructor):
+    """ Makes a spell classmethod return the same shared instance every time """
+    @functools.wraps(constructor)
+    def wrapper(cls):
+        return spell_registry.construct(cls, constructor)
+    wrapper._canonical_spell = True
+    return wrapper
 
 
 class Spell(ABC):
-    """Creates a spell"""
+    """Creates a spell
+
+    Spells are immutable and compare equal when class and attributes match.
+    """
+    kind = SpellKind.OTHER
+
     def __init__(self, name: str, incantation: str, effect: str, difficulty: str = "Simple", min_year: int = 1):
-        self.name = name
-        self.incantation = incantation
-        self.effect = effect
-        self.difficulty = difficulty
-        self.min_year = min_year
+        set_attribute = object.__setattr__
+        set_attribute(self, 'name', name)
+        set_attribute(self, 'incantation', incantation)
+        set_attribute(self, 'effect', effect)
+        set_attribute(self, 'difficulty', difficulty)
+        set_attribute(self, 'min_year', min_year)
+        set_attribute(self, '_hash', hash((type(self), name, incantation, effect,
+                                           difficulty, min_year)))
+
+    def __setattr__(self, name, value):
+        raise FrozenInstanceError(f"cannot assign to field '{name}'")
+
+    def __delattr__(self, name):
+        raise FrozenInstanceError(f"cannot delete field '{name}'")
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return (self._hash == other._hash
+                and self.name == other.name
+                and self.incantation == other.incantation
+                and self.effect == other.effect
+                and self.difficulty == other.difficulty
+                and self.min_year == other.min_year)
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        # Rebuild through __init__: assigning fields one by one is refused,
+        # and the hash of the strings differs between processes
+        return type(self), (self.name, self.incantation, self.effect, self.difficulty, self.min_year)
 
     @abstractmethod
     def cast(self):
@@ -293,6 +929,8 @@ class Spell(ABC):
 
 class Charm(Spell):
     """Creates a charm - a spell that alters the inherent qualities of an object"""
+    kind = SpellKind.CHARM
+
     def __init__(self, name: str, incantation: str, effect: str, difficulty: str = "Simple", min_year: int = 1):
         super().__init__(name, incantation, effect, difficulty, min_year)
 
@@ -302,19 +940,23 @@ class Charm(Spell):
                 "that is, its behaviour and capabilities")
 
     def cast(self) -> str:
-        return(f"{self.incantation}!")
+        return _incantation_shout(self.incantation)
 
     @classmethod
+    @canonical_spell
     def stuporus_ratiato(cls) -> 'Charm':
         return cls('The Stuporus Ratiato charm', 'Stuporus Ratiato', 'Makes objects fly')
 
     @classmethod
+    @canonical_spell
     def liberula(cls) -> 'Charm':
         return cls('The Liberula charm', 'Liberula', 'Allows a person to breath under water', 'Difficult', 5)
 
 
 class Transfiguration(Spell):
     """Creates a transfiguration - a spell that alters the form or appearance of an object"""
+    kind = SpellKind.TRANSFIGURATION
+
     def __init__(self, name: str, incantation: str, effect: str, difficulty: str = "Simple", min_year: int = 1):
         super().__init__(name, incantation, effect, difficulty, min_year)
 
@@ -323,14 +965,17 @@ class Transfiguration(Spell):
         return "Alteration of the object's form or appearance"
 
     @classmethod
+    @canonical_spell
     def alteraror_canieo(cls) -> 'Transfiguration':
         return cls('The Alteraro Canieo transfiguration', 'Alteraro Canieo', 'Turns an object into a can', 'Simple', 2)
 
     def cast(self) -> str:
-        return(f"{self.incantation}!")
+        return _incantation_shout(self.incantation)
 
 class Jinx(Spell):
     """Creates a jinx - a spell whose effects are irritating but amusing"""
+    kind = SpellKind.JINX
+
     def __init__(self, name: str, incantation: str, effect: str, difficulty: str = "Simple", min_year: int = 1):
         super().__init__(name, incantation, effect, difficulty, min_year)
 
@@ -341,14 +986,17 @@ class Jinx(Spell):
                 "almost playful and of minor inconvenience to the target")
 
     @classmethod
+    @canonical_spell
     def inceptotis(cls) -> 'Jinx':
         return cls('The Inceptotis jinx', 'Inceptotis', 'Makes a person talk baby talk', 'Simple')
 
     def cast(self) -> str:
-        return(f"{self.incantation}!")
+        return _incantation_shout(self.incantation)
 
 class Hex(Spell):
     """Creates a hex - a spell that affects an object in a negative manner"""
+    kind = SpellKind.HEX
+
     def __init__(self, name: str, incantation: str, effect: str, difficulty: str = "Medium", min_year: int = None):
         super().__init__(name, incantation, effect, difficulty, min_year)
 
@@ -359,14 +1007,17 @@ class Hex(Spell):
                 "Major inconvenience to the target.")
 
     @classmethod
+    @canonical_spell
     def rectaro(cls) -> 'Hex':
         return cls('The Rectaro hex', 'Rectaro', 'Exchanges a persons arms and legs', 'Difficult')
 
     def cast(self) -> str:
-        return(f"{self.incantation}!")
+        return _incantation_shout(self.incantation)
 
 class Curse(Spell):
     """Creates a curse - a spell that affects an object in a stflynngly negative manner"""
+    kind = SpellKind.CURSE
+
     def __init__(self, name: str, incantation: str, effect: str, difficulty: str = "Difficult", min_year: int = 6):
         super().__init__(name, incantation, effect, difficulty, min_year)
 
@@ -376,15 +1027,18 @@ class Curse(Spell):
                 "Intended to affect an object in a strongly negative manner.")
 
     @classmethod
+    @canonical_spell
     def fiera_satanotis(cls) -> 'Curse':
         return cls('Torture curse', 'Fiera Satanotis',
                    'Tortures a person, makes person suffer deeply', 'Difficult')
 
     def cast(self) -> str:
-        return(f"{self.incantation}!")
+        return _incantation_shout(self.incantation)
 
 class CounterSpell(Spell):
     """Creates a counter-spell - a spell that inhibits the effect of another spell"""
+    kind = SpellKind.COUNTER_SPELL
+
     def __init__(self, name: str, incantation: str, effect: str, difficulty: str = "Simple", min_year: int = 1):
         super().__init__(name, incantation, effect, difficulty, min_year)
 
@@ -393,15 +1047,18 @@ class CounterSpell(Spell):
         return ("Inhibites the effects of another spell")
 
     @classmethod
+    @canonical_spell
     def mufindo_immolim(cls) -> 'CounterSpell':
         return cls('The Mufindo Immolim counter spell', 'Mufindo Immolim',
                    'Counteracts the immobilisation spell that prevents a person from moving')
 
     def cast(self) -> str:
-        return(f"{self.incantation}!")
+        return _incantation_shout(self.incantation)
 
 class HealingSpell(Spell):
     """Creates a healing-spell - a spell that improves the condition of a living object"""
+    kind = SpellKind.HEALING_SPELL
+
     def __init__(self, name: str, incantation: str, effect: str, difficulty: str = "Simple", min_year: int = 1):
         super().__init__(name, incantation, effect, difficulty, min_year)
 
@@ -410,12 +1067,279 @@ class HealingSpell(Spell):
         return "Improves the condition of a living object"
 
     @classmethod
+    @canonical_spell
     def porim_perfite(cls) -> 'HealingSpell':
         return cls('Wound healing spell', 'Porim Perfite',
                    'Heals all kinds of wounds, even bad ones', 'Difficult', 5)
 
     def cast(self) -> str:
-        return(f"{self.incantation}!")
+        return _incantation_shout(self.incantation)
+
+
+# How pupils learn and cast spells, one policy per SpellKind
+
+def _learn_by_year(pupil: Pupil, spell: Spell) -> Outcome:
+    if spell.min_year is not None:
+        if pupil.current_year >= spell.min_year:
+            pupil.known_spells.add(spell)
+            return _emit(Outcome.LEARNED, pupil, spell)
+
+        elif pupil.exhibits_trait('highly intelligent'):
+            pupil.known_spells.add(spell)
+            return _emit(Outcome.LEARNED, pupil, spell)
+
+        else:
+            return _emit(Outcome.TOO_YOUNG, pupil, spell)
+
+    # Spells without a minimum year can only be studied as dark magic
+    return _emit(Outcome.NOT_LEARNABLE, pupil, spell)
+
+
+def _learn_dark_magic(pupil: Pupil, spell: Spell) -> Outcome:
+    if spell.min_year is not None:
+        return _learn_by_year(pupil, spell)
+
+    # Only evil pupils would study hexes and curses
+    if pupil.exhibits_trait('evil'):
+        pupil.known_spells.add(spell)
+        return _emit(Outcome.LEARNED, pupil, spell)
+    else:
+        return _emit(Outcome.DARK_STUDY_REFUSED, pupil, spell)
+
+
+def _cast_if_known(pupil: Pupil, spell: Spell):
+    if spell in pupil.known_spells:
+        return _spell_cast_by(pupil.name, spell.incantation)
+    else:
+        return _emit(Outcome.NOT_STUDIED, pupil, spell)
+
+
+def _cast_hex(pupil: Pupil, spell: Spell):
+    if not pupil.exhibits_trait('evil'):
+        return _emit(Outcome.HEX_REFUSED, pupil, spell)
+    return _emit(Outcome.HEX_CAST, pupil, spell)
+
+
+def _cast_curse(pupil: Pupil, spell: Spell):
+    return _emit(Outcome.CURSE_REFUSED, pupil, spell)
+
+
+_LEARN_POLICIES = tuple({SpellKind.HEX: _learn_dark_magic,
+                         SpellKind.CURSE: _learn_dark_magic}.get(kind, _learn_by_year)
+                        for kind in SpellKind)
+
+_CAST_POLICIES = tuple({SpellKind.HEX: _cast_hex,
+                        SpellKind.CURSE: _cast_curse}.get(kind, _cast_if_known)
+                       for kind in SpellKind)
+
+
+def canonical_spells(spell_class=None):
+    """ Yields the canonical spells defined on a spell class and its subclasses """
+    classes = [Spell if spell_class is None else spell_class]
+    for cls in classes:
+        classes.extend(cls.__subclasses__())
+        for name, attribute in vars(cls).items():
+            if (isinstance(attribute, classmethod)
+                    and getattr(attribute.__func__, '_canonical_spell', False)):
+                yield getattr(cls, name)()
+
+
+class IncantationMatcher:
+    """ Finds the incantations most similar to a possibly misspelled one
+
+    Every incantation is split into trigrams, and an inverted index maps each
+    trigram to the sorted ids of the incantations containing it. Similarity
+    is the Dice coefficient of the trigram sets. A result has to share a
+    minimum number of trigrams with the query, so candidates are only
+    collected from the postings of the query's rarest trigrams (prefix
+    filtering); each candidate is then verified by binary search in the
+    postings of the common trigrams, unless counting a common posting is
+    cheaper than the searches. No edit distances are computed.
+    """
+    # Cost of a binary search in a posting, relative to counting one posting entry
+    lookup_cost = 6
+
+    def __init__(self, incantations=()):
+        self._incantations = []
+        self._ids = {}
+        self._sizes = array('H')
+        self._postings = {}
+
+        for incantation in incantations:
+            self.add(incantation)
+
+    @staticmethod
+    def trigrams(text: str) -> set:
+        padded = f"  {text} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def add(self, incantation: str):
+        if incantation in self._ids:
+            return
+        incantation_id = self._ids[incantation] = len(self._incantations)
+        self._incantations.append(incantation)
+
+        trigrams = self.trigrams(incantation)
+        self._sizes.append(len(trigrams))
+        for trigram in trigrams:
+            posting = self._postings.get(trigram)
+            if posting is None:
+                posting = self._postings[trigram] = array('I')
+            posting.append(incantation_id)
+
+    def match(self, query: str, k: int = 5, min_score: float = 0.4) -> list:
+        """ Returns up to k (incantation, score) pairs, best first """
+        postings = [self._postings.get(gram, ()) for gram in self.trigrams(query)]
+        postings.sort(key=len)
+        n = len(postings)
+        # Fewest trigrams a result must share with the query to reach min_score...
+        # (the epsilon keeps float error from rounding an exact boundary up)
+        needed = max(1, math.ceil(min_score * n / (2 - min_score) - 1e-9))
+        # ...so every result is in one of the postings of the n - needed + 1 rarest trigrams
+        prefix = n - needed + 1
+
+        shared = Counter()
+        for posting in postings[:prefix]:
+            shared.update(posting)
+        # Common postings are counted too while that is cheaper than a binary
+        # search per candidate; ids first seen there cannot reach `needed`
+        common = postings[prefix:]
+        while common and len(common[0]) < self.lookup_cost * len(shared):
+            shared.update(common.pop(0))
+        candidates = itertools.compress(shared.items(),
+                                        map((needed - len(common)).__le__, shared.values()))
+
+        sizes = self._sizes
+        scored = []
+        for candidate, count in candidates:
+            for posting in common:
+                i = bisect.bisect_left(posting, candidate)
+                if i < len(posting) and posting[i] == candidate:
+                    count += 1
+            score = 2 * count / (n + sizes[candidate])
+            if score >= min_score:
+                scored.append((score, candidate))
+
+        return [(self._incantations[candidate], score)
+                for score, candidate in heapq.nlargest(k, scored)]
+
+    def __len__(self) -> int:
+        return len(self._incantations)
+
+
+class SpellCatalog:
+    """ Looks up spells by incantation, incantation prefix, difficulty and min_year
+
+    Incantations are matched case-insensitively and ignoring extra spaces.
+    """
+    def __init__(self, spells=()):
+        self._spells = {}
+        self._by_incantation = {}
+        self._by_difficulty = {}
+        self._by_min_year = {}
+        self._matcher = None
+
+        for spell in spells:
+            self._index(spell)
+        self._sorted_incantations = sorted(self._by_incantation)
+        self._sorted_min_years = sorted(year for year in self._by_min_year if year is not None)
+
+    @classmethod
+    def standard(cls) -> 'SpellCatalog':
+        """ A catalog of all canonical spells, e.g. Charm.stuporus_ratiato() """
+        return cls(canonical_spells())
+
+    @staticmethod
+    def normalize(incantation: str) -> str:
+        return ' '.join(incantation.casefold().split())
+
+    def _index(self, spell: Spell) -> tuple:
+        """ Adds a spell to the dicts, returns whether its incantation and min_year are new """
+        if spell in self._spells:
+            return False, False
+        self._spells[spell] = None
+
+        key = self.normalize(spell.incantation)
+        new_key = key not in self._by_incantation
+        if new_key:
+            self._by_incantation[key] = []
+            if self._matcher is not None:
+                self._matcher.add(key)
+        self._by_incantation[key].append(spell)
+
+        self._by_difficulty.setdefault(spell.difficulty, []).append(spell)
+        new_year = spell.min_year not in self._by_min_year
+        if new_year:
+            self._by_min_year[spell.min_year] = []
+        self._by_min_year[spell.min_year].append(spell)
+        return new_key, new_year
+
+    def add(self, spell: Spell):
+        new_key, new_year = self._index(spell)
+        if new_key:
+            bisect.insort(self._sorted_incantations, self.normalize(spell.incantation))
+        if new_year and spell.min_year is not None:
+            bisect.insort(self._sorted_min_years, spell.min_year)
+
+    def __getitem__(self, incantation: str) -> Spell:
+        try:
+            return self._by_incantation[self.normalize(incantation)][0]
+        except KeyError:
+            raise KeyError(f"No spell with the incantation '{incantation}'") from None
+
+    def get(self, incantation: str, default=None) -> Spell:
+        spells = self._by_incantation.get(self.normalize(incantation))
+        return spells[0] if spells else default
+
+    def all_with_incantation(self, incantation: str) -> list:
+        return list(self._by_incantation.get(self.normalize(incantation), ()))
+
+    def _keys_starting_with(self, prefix: str):
+        keys = self._sorted_incantations
+        prefix = self.normalize(prefix)
+        for i in range(bisect.bisect_left(keys, prefix), len(keys)):
+            if not keys[i].startswith(prefix):
+                break
+            yield keys[i]
+
+    def starting_with(self, prefix: str, limit: int = None) -> list:
+        """ Spells whose incantation starts with `prefix`, sorted by incantation """
+        keys = itertools.islice(self._keys_starting_with(prefix), limit)
+        return [spell for key in keys for spell in self._by_incantation[key]][:limit]
+
+    def complete(self, prefix: str, limit: int = 10) -> list:
+        """ Suggests incantations for autocompletion """
+        keys = itertools.islice(self._keys_starting_with(prefix), limit)
+        return [self._by_incantation[key][0].incantation for key in keys]
+
+    def fuzzy(self, incantation: str, k: int = 5, min_score: float = 0.4) -> list:
+        """ Returns up to k (spell, score) pairs for a misspelled incantation """
+        if self._matcher is None:
+            self._matcher = IncantationMatcher(self._by_incantation)
+
+        matches = self._matcher.match(self.normalize(incantation), k, min_score)
+        found = [(spell, score) for key, score in matches for spell in self._by_incantation[key]]
+        return found[:k]
+
+    def with_difficulty(self, difficulty: str) -> list:
+        return list(self._by_difficulty.get(difficulty, ()))
+
+    def with_min_year(self, min_year: int) -> list:
+        return list(self._by_min_year.get(min_year, ()))
+
+    def learnable_in(self, year: int) -> list:
+        """ Spells with a min_year of at most `year` """
+        years = self._sorted_min_years[:bisect.bisect_right(self._sorted_min_years, year)]
+        return [spell for min_year in years for spell in self._by_min_year[min_year]]
+
+    def __contains__(self, spell) -> bool:
+        return spell in self._spells
+
+    def __iter__(self):
+        return iter(self._spells)
+
+    def __len__(self) -> int:
+        return len(self._spells)
 
 
 @dataclass(frozen=True)
@@ -430,7 +1354,7 @@ class DarkArmyMember():
         return master_odon
 
     def cast_spell(self, spell) -> str:
-        return(f"{self.name}: {spell.incantation}!")
+        return _spell_cast_by(self.name, spell.incantation)
 
 
 @dataclass
@@ -441,41 +1365,1662 @@ class Department:
     founded_in: int = 991
 
     def current_age(self):
-        now = datetime.datetime.now().year
+        now = school_clock.year
         return (now - self.founded_in) + 1
 
 
-class Letter:
-    total_number_of_letters = 0
+class _LetterShard:
+    """ The letter metrics recorded by one thread """
+    __slots__ = ('letters', 'bytes_written', 'recipients', 'open_latency', 'close_latency')
+
+    def __init__(self):
+        self.letters = 0
+        self.bytes_written = 0
+        self.recipients = Counter()
+        self.open_latency = array('Q', bytes(8 * LetterMetrics.latency_buckets))
+        self.close_latency = array('Q', bytes(8 * LetterMetrics.latency_buckets))
+
+    def merge(self, other: '_LetterShard'):
+        self.letters += other.letters
+        self.bytes_written += other.bytes_written
+        self.recipients.update(other.recipients)
+        for histogram, other_histogram in ((self.open_latency, other.open_latency),
+                                           (self.close_latency, other.close_latency)):
+            for bucket, count in enumerate(other_histogram):
+                histogram[bucket] += count
+
+
+class _ShardOwner:
+    """ Lives in a thread's local storage; its shard is retired when the thread ends """
+    __slots__ = ('shard', '__weakref__')
+
+    def __init__(self, shard: _LetterShard):
+        self.shard = shard
+
+
+class LetterMetrics:
+    """ Counts letters, bytes written, recipients and file open/close latencies
+
+    Every thread records into its own shard, so recording takes no lock.
+    Reading merges the shards of all threads. When a thread ends, its
+    shard is folded into a shared total, so short-lived threads do not
+    pile up shards. Latencies are kept in
+    histograms with power-of-two buckets: bucket i counts latencies of
+    less than 2**i nanoseconds, the last bucket everything slower.
+    """
+    latency_buckets = 40
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = set()
+        self._retired = _LetterShard()
+        self._lock = threading.Lock()
+
+    def _shard(self) -> _LetterShard:
+        try:
+            return self._local.owner.shard
+        except AttributeError:
+            shard = _LetterShard()
+            owner = self._local.owner = _ShardOwner(shard)
+            # The thread's local storage, and with it the owner, goes away with the thread
+            weakref.finalize(owner, self._retire, shard)
+            with self._lock:
+                self._shards.add(shard)
+            return shard
+
+    def _retire(self, shard: _LetterShard):
+        with self._lock:
+            self._shards.discard(shard)
+            self._retired.merge(shard)
+
+    def record_letter(self, recipient: str = None, size: int = 0):
+        shard = self._shard()
+        shard.letters += 1
+        shard.bytes_written += size
+        if recipient is not None:
+            shard.recipients[recipient] += 1
+
+    def record_bytes(self, size: int):
+        self._shard().bytes_written += size
+
+    def record_open(self, nanoseconds: int):
+        self._shard().open_latency[min(nanoseconds.bit_length(), self.latency_buckets - 1)] += 1
+
+    def record_close(self, nanoseconds: int):
+        self._shard().close_latency[min(nanoseconds.bit_length(), self.latency_buckets - 1)] += 1
+
+    def _shards_snapshot(self) -> list:
+        with self._lock:
+            return [self._retired, *self._shards]
+
+    @property
+    def letters(self) -> int:
+        return sum(shard.letters for shard in self._shards_snapshot())
+
+    @property
+    def bytes_written(self) -> int:
+        return sum(shard.bytes_written for shard in self._shards_snapshot())
+
+    def recipients(self) -> Counter:
+        """ Number of letters written to every recipient """
+        total = Counter()
+        for shard in self._shards_snapshot():
+            total.update(shard.recipients)
+        return total
+
+    def _histogram(self, name: str) -> dict:
+        totals = [sum(counts) for counts in zip(*(getattr(shard, name) for shard in self._shards_snapshot()))]
+        return {1 << bucket: count for bucket, count in enumerate(totals) if count}
+
+    def open_latency(self) -> dict:
+        """ Histogram of file open latencies: {upper bound in ns: count} """
+        return self._histogram('open_latency')
+
+    def close_latency(self) -> dict:
+        """ Histogram of file close latencies: {upper bound in ns: count} """
+        return self._histogram('close_latency')
+
+    def reset(self):
+        """ Starts counting from zero; not atomic with respect to writing threads """
+        for shard in self._shards_snapshot():
+            shard.__init__()
+
+
+letter_metrics = LetterMetrics()
+
+
+class _LetterType(type):
+    @property
+    def total_number_of_letters(cls) -> int:
+        return letter_metrics.letters
+
 
-    def __init__(self, letter_name):
+class Letter(metaclass=_LetterType):
+    def __init__(self, letter_name, recipient=None):
         self.letter_name = letter_name
+        self.recipient = recipient
+
+    @property
+    def total_number_of_letters(self) -> int:
+        return letter_metrics.letters
 
     def __enter__(self):
+        start = time.perf_counter_ns()
         self.letter = open(self.letter_name, 'w')
-        self.__class__.total_number_of_letters += 1
+        letter_metrics.record_open(time.perf_counter_ns() - start)
+        letter_metrics.record_letter(self.recipient)
         return self.letter
 
     def __exit__(self, exc_type, exc_value, traceback):
         if self.letter:
+            size = self.letter.tell()
+            start = time.perf_counter_ns()
             self.letter.close()
+            letter_metrics.record_close(time.perf_counter_ns() - start)
+            letter_metrics.record_bytes(size)
+
+
+class LetterWriter(ABC):
+    """ Delivers the letters written by Castle Kilmere members """
+    @abstractmethod
+    def write(self, recipient: str, content: str):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class DearRecipientWriter(LetterWriter):
+    """ Writes every letter to its own dear_<recipient>.txt, the default behaviour
+
+    A new letter to the same recipient replaces the previous one.
+    """
+    def __init__(self, directory='.'):
+        self.directory = directory
+
+    def write(self, recipient: str, content: str):
+        with Letter(os.path.join(self.directory, f"dear_{recipient}.txt"), recipient) as l:
+            l.write(content)
+
+
+class SegmentLetterWriter(LetterWriter):
+    """ Appends letters to segment files, writing them in batches
+
+    Letters are encoded into a buffer that is written to the current
+    segment (letters-00000.seg, letters-00001.seg, ...) once it holds
+    flush_bytes, or by a timer flush_interval seconds after the first
+    letter in the buffer. Writers still open at exit are flushed.
+    A new segment is started when the current one reaches segment_bytes.
+    Segment and index files stay open between batches.
+
+    Every letter gets a line in letters.idx:
+
+        <segment> <offset> <length> <recipient>
+    """
+    index_name = 'letters.idx'
+
+    def __init__(self, directory, flush_bytes: int = 1 << 20, flush_interval: float = 1.0,
+                 segment_bytes: int = 64 << 20):
+        self.directory = directory
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self._buffer = bytearray()
+        self._entries = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+        os.makedirs(directory, exist_ok=True)
+        segments = sorted(name for name in os.listdir(directory) if name.endswith('.seg'))
+        self._segment = int(segments[-1][len('letters-'):-len('.seg')]) if segments else 0
+        self._segment_file = self._open_segment()
+        self._offset = self._segment_file.tell()
+        self._index_file = open(os.path.join(directory, self.index_name), 'a', encoding='utf-8')
+        _open_buffers.add(self)
+
+    def segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"letters-{segment:05d}.seg")
+
+    def write(self, recipient: str, content: str):
+        if '\n' in recipient:
+            raise ValueError("recipient must not contain a newline")
+        data = content.encode('utf-8')
+        with self._lock:
+            offset = self._offset + len(self._buffer)
+            if offset and offset + len(data) > self.segment_bytes:
+                self._write()
+                self._next_segment()
+                offset = 0
+            self._entries.append(f"{self._segment} {offset} {len(data)} {recipient}\n")
+            self._buffer += data
+            letter_metrics.record_letter(recipient, len(data))
+            if len(self._buffer) >= self.flush_bytes:
+                self._write()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _write(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._segment_file.write(self._buffer)
+        self._segment_file.flush()
+        self._index_file.writelines(self._entries)
+        self._index_file.flush()
+        self._offset += len(self._buffer)
+        self._buffer.clear()
+        self._entries.clear()
+
+    def _open_segment(self):
+        start = time.perf_counter_ns()
+        segment_file = open(self.segment_path(self._segment), 'ab')
+        letter_metrics.record_open(time.perf_counter_ns() - start)
+        return segment_file
+
+    def _close_segment(self):
+        start = time.perf_counter_ns()
+        self._segment_file.close()
+        letter_metrics.record_close(time.perf_counter_ns() - start)
+
+    def _next_segment(self):
+        self._close_segment()
+        self._segment += 1
+        self._segment_file = self._open_segment()
+        self._offset = 0
+
+    def flush(self):
+        with self._lock:
+            if (self._buffer or self._entries) and not self._segment_file.closed:
+                self._write()
+
+    def close(self):
+        with self._lock:
+            if self._segment_file.closed:
+                return
+            if self._buffer or self._entries:
+                self._write()
+            self._close_segment()
+            self._index_file.close()
+        _open_buffers.discard(self)
+
+    def letters_to(self, recipient: str) -> list:
+        """ Reads back all letters written to a recipient, oldest first """
+        self.flush()
+        letters = []
+        with open(os.path.join(self.directory, self.index_name), encoding='utf-8') as index:
+            for line in index:
+                segment, offset, length, name = line.rstrip('\n').split(' ', 3)
+                if name == recipient:
+                    with open(self.segment_path(int(segment)), 'rb') as f:
+                        f.seek(int(offset))
+                        letters.append(f.read(int(length)).decode('utf-8'))
+        return letters
+
+
+class _IndexRun:
+    """ One sorted run of a letter archive index, read through mmap
+
+    Behaves as the sorted sequence of its recipient keys, for bisect.
+    """
+    _magic = b'LTRRUN01'
+    _header = struct.Struct('<8sQQ')
+
+    def __init__(self, path: str, number: int):
+        self.number = number
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n, keys_size = self._header.unpack_from(self._map)
+        if magic != self._magic:
+            raise ValueError(f"{path} is not a letter archive index run")
+        view, start = memoryview(self._map), self._header.size
+        self._count = n
+        self._key_offsets = view[start:start + 8 * n].cast('Q')
+        self._offsets = view[start + 8 * n:start + 16 * n].cast('Q')
+        self._key_lengths = view[start + 16 * n:start + 20 * n].cast('I')
+        self._lengths = view[start + 20 * n:start + 24 * n].cast('I')
+        self._keys = view[start + 24 * n:start + 24 * n + keys_size]
+
+    @classmethod
+    def write(cls, path: str, entries: list):
+        """ Writes sorted (key, offset, length) entries to a new run file """
+        entry_keys = list(map(operator.itemgetter(0), entries))
+        # Every distinct key is stored once, at the offset of its first occurrence
+        distinct = list(dict.fromkeys(entry_keys))
+        key_ids = dict(zip(distinct, itertools.accumulate(map(len, distinct), initial=0)))
+        keys = b''.join(distinct)
+        key_offsets = array('Q', map(key_ids.__getitem__, entry_keys))
+        offsets = array('Q', map(operator.itemgetter(1), entries))
+        key_lengths = array('I', map(len, entry_keys))
+        lengths = array('I', map(operator.itemgetter(2), entries))
+
+        with open(path, 'wb') as f:
+            f.write(cls._header.pack(cls._magic, len(offsets), len(keys)))
+            for column in (key_offsets, offsets, key_lengths, lengths):
+                column.tofile(f)
+            f.write(keys)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> bytes:
+        offset = self._key_offsets[i]
+        return self._keys[offset:offset + self._key_lengths[i]].tobytes()
+
+    def find(self, key: bytes) -> list:
+        """ (offset, length) of the letters to a key, oldest first """
+        lo = bisect.bisect_left(self, key)
+        hi = bisect.bisect_right(self, key, lo=lo)
+        return [(self._offsets[i], self._lengths[i]) for i in range(lo, hi)]
+
+    def entries(self):
+        """ Iterates over the (key, offset, length) entries in sorted order """
+        keys = self._keys.tobytes()
+        ends = map(operator.add, self._key_offsets, self._key_lengths)
+        return zip(map(keys.__getitem__, map(slice, self._key_offsets, ends)),
+                   self._offsets, self._lengths)
+
+    def release(self):
+        for name in ('_key_offsets', '_offsets', '_key_lengths', '_lengths', '_keys'):
+            getattr(self, name).release()
+        self._map.close()
+
+
+class LetterArchive(LetterWriter):
+    """ Keeps letters in one append-only data file with a sorted recipient index
+
+    The data file holds the letters back to back. The index lists the
+    recipient, offset and length of every letter, sorted by recipient and
+    then by age, in a few sorted runs. The runs and the data file are read
+    through mmap: finding the letters to a recipient is a binary search in
+    every run, and views() hands out memoryview slices of the data file
+    without copying.
+
+    Letters written since the last flush are indexed in a dict by
+    recipient. flush(), or pending_limit of them piling up, sorts them into
+    a new run. The newest runs are then merged while a run is at most
+    twice as long as the next, so there are O(log n) runs and every entry
+    is merged O(log n) times. remove() hides the letters to a recipient;
+    the next flush merges all runs without them. compact() rewrites the
+    data file without removed letters, grouping the letters of every
+    recipient together, and leaves a single run. The index file names the
+    runs and the data file, so flushes and compaction are atomic: new
+    files are written first, then the index is replaced.
+    """
+    index_name = 'archive.idx'
+    _magic = b'LTRARCH2'
+    _header = struct.Struct('<8sQQ')
+
+    def __init__(self, directory, pending_limit: int = 10_000):
+        self.directory = directory
+        self.pending_limit = pending_limit
+        self._lock = threading.RLock()
+        self._pending = {}
+        self._pending_count = 0
+        self._removed = set()
+        self._runs = []
+        self._data_map = None
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+        self._data_file = open(self._data_path(self._generation), 'ab')
+        self._size = self._data_file.tell()
+        _open_buffers.add(self)
+
+    def _data_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"letters-{generation:05d}.dat")
+
+    def _run_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"archive-{number:05d}.run")
+
+    def _load_index(self):
+        self._release_index()
+        self._generation, self._next_run = 0, 0
+        path = os.path.join(self.directory, self.index_name)
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            index = f.read()
+        magic, self._generation, n = self._header.unpack_from(index)
+        if magic != self._magic:
+            raise ValueError(f"{path} is not a letter archive index")
+        numbers = array('Q')
+        numbers.frombytes(index[self._header.size:self._header.size + 8 * n])
+        self._runs = [_IndexRun(self._run_path(number), number) for number in numbers]
+        self._next_run = max(numbers, default=-1) + 1
+
+    def _release_index(self):
+        for run in self._runs:
+            run.release()
+        self._runs = []
+
+    def _new_run(self, entries: list) -> list:
+        """ Writes sorted entries to a new run, returned in a list (empty if there are none) """
+        if not entries:
+            return []
+        number, self._next_run = self._next_run, self._next_run + 1
+        _IndexRun.write(self._run_path(number), entries)
+        return [_IndexRun(self._run_path(number), number)]
+
+    def _commit(self, runs: list, generation: int):
+        """ Replaces the index by one naming `runs` and a data file generation """
+        path = os.path.join(self.directory, self.index_name)
+        numbers = array('Q', (run.number for run in runs))
+        with open(path + '.tmp', 'wb') as f:
+            f.write(self._header.pack(self._magic, generation, len(numbers)))
+            numbers.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+        for run in self._runs:
+            if run not in runs:
+                run.release()
+                os.remove(self._run_path(run.number))
+        self._runs, self._generation = runs, generation
+
+    def _entries(self, key: bytes) -> list:
+        entries = []
+        if key not in self._removed:
+            for run in self._runs:
+                entries += run.find(key)
+        pending = self._pending.get(key, ())
+        if pending:
+            self._data_file.flush()
+        return entries + list(pending)
+
+    def _data_view(self, end: int) -> memoryview:
+        if end == 0:
+            # Empty letters only, maybe in an empty file, which mmap refuses
+            return memoryview(b'')
+        if self._data_map is None or len(self._data_map) < end:
+            with open(self._data_path(self._generation), 'rb') as f:
+                # Views handed out earlier keep the previous map alive
+                self._data_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._data_map)
+
+    def write(self, recipient: str, content: str):
+        data = content.encode('utf-8')
+        with self._lock:
+            self._data_file.write(data)
+            self._pending.setdefault(recipient.encode('utf-8'), []).append((self._size, len(data)))
+            self._pending_count += 1
+            self._size += len(data)
+            if self._pending_count >= self.pending_limit:
+                self.flush()
+        letter_metrics.record_letter(recipient, len(data))
+
+    def views(self, recipient: str) -> list:
+        """ The letters to a recipient as memoryviews of the data file, oldest first """
+        with self._lock:
+            entries = self._entries(recipient.encode('utf-8'))
+            if not entries:
+                return []
+            data = self._data_view(max(offset + length for offset, length in entries))
+            return [data[offset:offset + length] for offset, length in entries]
+
+    def letters_to(self, recipient: str) -> list:
+        """ The letters to a recipient, oldest first """
+        return [str(view, 'utf-8') for view in self.views(recipient)]
+
+    def recipients(self) -> list:
+        """ Sorted names of everybody who has letters in the archive """
+        with self._lock:
+            keys = {key for run in self._runs for key, _, _ in run.entries()} - self._removed
+            keys.update(self._pending)
+            return sorted(key.decode('utf-8') for key in keys)
+
+    def remove(self, recipient: str):
+        """ Forgets all letters written to a recipient so far """
+        key = recipient.encode('utf-8')
+        with self._lock:
+            self._removed.add(key)
+            self._pending_count -= len(self._pending.pop(key, ()))
+
+    def _indexed_entries(self):
+        """ Sorted (key, offset, length) entries of all runs, without removed keys """
+        removed = self._removed
+        entries = heapq.merge(*(run.entries() for run in self._runs))
+        return (entry for entry in entries if entry[0] not in removed) if removed else entries
+
+    def flush(self):
+        """ Writes buffered letters and sorts the pending ones into a new index run """
+        with self._lock:
+            self._data_file.flush()
+            if not self._pending and not self._removed:
+                return
+            pending = sorted((key, offset, length) for key, letters in self._pending.items()
+                             for offset, length in letters)
+            if self._removed:
+                runs = self._new_run(list(heapq.merge(self._indexed_entries(), pending)))
+            else:
+                runs = self._runs + self._new_run(pending)
+                while len(runs) > 1 and len(runs[-2]) <= 2 * len(runs[-1]):
+                    merged = runs[-2:]
+                    # Sorting two sorted runs is a single merge pass
+                    runs[-2:] = self._new_run(sorted(itertools.chain(*(run.entries() for run in merged))))
+                    for run in merged:
+                        # Runs written by this flush are not in the index yet
+                        if run not in self._runs:
+                            run.release()
+                            os.remove(self._run_path(run.number))
+            self._commit(runs, self._generation)
+            self._pending.clear()
+            self._pending_count = 0
+            self._removed.clear()
+
+    def compact(self):
+        """ Rewrites the data file without removed letters, grouped by recipient """
+        with self._lock:
+            self.flush()
+            old_path, generation = self._data_path(self._generation), self._generation + 1
+            data = self._data_view(self._size) if self._runs else None
+            compacted, offset = [], 0
+            with open(self._data_path(generation), 'wb') as f:
+                for key, old_offset, length in self._indexed_entries():
+                    f.write(data[old_offset:old_offset + length])
+                    compacted.append((key, offset, length))
+                    offset += length
+                f.flush()
+                os.fsync(f.fileno())
+            if data is not None:
+                data.release()
+
+            self._data_file.close()
+            self._commit(self._new_run(compacted), generation)
+            self._data_file = open(self._data_path(generation), 'ab')
+            self._size = offset
+            self._data_map = None
+            os.remove(old_path)
+
+    def close(self):
+        with self._lock:
+            if self._data_file.closed:
+                return
+            self.flush()
+            self._data_file.close()
+            self._release_index()
+            self._data_map = None
+        _open_buffers.discard(self)
+
+
+def compact_letter_archive(directory):
+    """ Compacts the letter archive in `directory`, the command to run for maintenance:
+
+        python -c "import magical_universe; magical_universe.compact_letter_archive('letters')"
+    """
+    with LetterArchive(directory) as archive:
+        archive.compact()
+
+
+_letter_writer = DearRecipientWriter()
+
+
+def set_letter_writer(writer: LetterWriter) -> LetterWriter:
+    """ Delivers all letters through `writer` from now on, returns the previous writer """
+    global _letter_writer
+    previous, _letter_writer = _letter_writer, writer
+    return previous
+
+
+@contextmanager
+def letter_writer(writer: LetterWriter):
+    """ Delivers all letters through `writer` within a with-block, closing it afterwards """
+    previous = set_letter_writer(writer)
+    try:
+        with writer:
+            yield writer
+    finally:
+        set_letter_writer(previous)
+
+
+class OwlPost:
+    """ Delivers letters from asyncio code without blocking the event loop
+
+    Letters wait in a bounded queue, so senders are slowed down once
+    max_pending letters are waiting. A number of owls take letters from
+    the queue and hand them to the letter writer on a thread pool.
+    Closing the owl post delivers every queued letter and flushes the
+    writer. Use it as an async context manager:
+
+        async with OwlPost() as owl_post:
+            await bromley.awrite_letter('Lissy', 'Hello Lissy!')
+
+    Within the with-block it is the owl post used by awrite_letter.
+    """
+    def __init__(self, writer: LetterWriter = None, owls: int = 4, max_pending: int = 1000):
+        self.writer = writer
+        self.owls = owls
+        self.max_pending = max_pending
+        self._queue = None
+        self._tasks = []
+        self._executor = None
+        self._closed = False
+        self._previous = None
+
+    def _start(self):
+        self._queue = asyncio.Queue(self.max_pending)
+        self._executor = ThreadPoolExecutor(self.owls, thread_name_prefix='owl')
+        self._tasks = [asyncio.create_task(self._fly()) for _ in range(self.owls)]
+
+    def _deliver(self, recipient: str, content: str):
+        (self.writer or _letter_writer).write(recipient, content)
+
+    async def _fly(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            recipient, content, delivered = await self._queue.get()
+            try:
+                await loop.run_in_executor(self._executor, self._deliver, recipient, content)
+            except Exception as error:
+                if not delivered.done():
+                    delivered.set_exception(error)
+            else:
+                if not delivered.done():
+                    delivered.set_result(recipient)
+            finally:
+                self._queue.task_done()
+
+    async def send(self, recipient: str, content: str) -> asyncio.Future:
+        """ Queues a letter, waiting while the queue is full
+
+        Returns a future that is resolved once the letter was written.
+        """
+        if self._closed:
+            raise RuntimeError("the owl post is closed")
+        if self._queue is None:
+            self._start()
+        delivered = asyncio.get_running_loop().create_future()
+        await self._queue.put((recipient, content, delivered))
+        return delivered
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def close(self):
+        """ Delivers all queued letters, then flushes the writer """
+        self._closed = True
+        if self._queue is None:
+            return
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, (self.writer or _letter_writer).flush)
+        self._executor.shutdown()
+
+    async def __aenter__(self):
+        self._previous = set_owl_post(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        try:
+            await self.close()
+        finally:
+            set_owl_post(self._previous)
+
+
+_owl_post = None
+
+
+def set_owl_post(owl_post: OwlPost) -> OwlPost:
+    """ Makes awrite_letter deliver through `owl_post`, returns the previous one """
+    global _owl_post
+    previous, _owl_post = _owl_post, owl_post
+    return previous
+
 
 class Potion:
     """ Creates a potion """
     def __init__(self, ingredients):
         self.ingredients = ingredients
-        self.counter = -1
 
     def __iter__(self):
-        return self
+        return iter(self.ingredients)
+
+    def __len__(self):
+        return len(self.ingredients)
+
+
+class IngredientVocabulary:
+    """ Interns ingredient names, giving every ingredient a small integer id """
+    def __init__(self):
+        self._ids = {}
+        self._names = []
+
+    def id(self, ingredient: str) -> int:
+        """ Returns the id of an ingredient, adding the ingredient if it is new """
+        try:
+            return self._ids[ingredient]
+        except KeyError:
+            ingredient_id = self._ids[ingredient] = len(self._names)
+            self._names.append(ingredient)
+            return ingredient_id
+
+    def ids(self, ingredients) -> array:
+        """ Returns the ids of several ingredients, adding new ones """
+        ingredients = list(ingredients)
+        try:
+            return array('I', map(self._ids.__getitem__, ingredients))
+        except KeyError:
+            return array('I', map(self.id, ingredients))
+
+    def name(self, ingredient_id: int) -> str:
+        return self._names[ingredient_id]
+
+    def __contains__(self, ingredient: str) -> bool:
+        return ingredient in self._ids
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+ingredient_vocabulary = IngredientVocabulary()
+
+SHOPPING_CHUNK_SIZE = 4096
+
+
+def _add_ingredient_counts(counts: array, ingredients, vocabulary) -> array:
+    """ Adds the ingredients of one chunk of potions to an id-indexed count array """
+    chunk = Counter(ingredients)
+    ids = [vocabulary.id(ingredient) for ingredient in chunk]
+    if len(counts) < len(vocabulary):
+        counts.extend(itertools.repeat(0, len(vocabulary) - len(counts)))
+    for ingredient_id, count in zip(ids, chunk.values()):
+        counts[ingredient_id] += count
+    return counts
+
+
+def shopping_list(potions, chunk_size: int = SHOPPING_CHUNK_SIZE,
+                  vocabulary: IngredientVocabulary = None) -> Counter:
+    """ Counts how often every ingredient is needed to brew all potions
+
+    `potions` may be any iterable, including a generator. It is consumed
+    chunk_size potions at a time, so memory does not grow with the number
+    of potions, only with the number of distinct ingredients.
+    """
+    vocabulary = ingredient_vocabulary if vocabulary is None else vocabulary
+    potions = iter(potions)
+    counts = array('Q')
+    while True:
+        chunk = [potion.ingredients for potion in itertools.islice(potions, chunk_size)]
+        if not chunk:
+            break
+        _add_ingredient_counts(counts, itertools.chain.from_iterable(chunk), vocabulary)
+
+    return Counter({vocabulary.name(ingredient_id): count
+                    for ingredient_id, count in enumerate(counts) if count})
+
+
+def _count_ingredients(chunk: list) -> Counter:
+    """ Worker side of parallel_shopping_list: counts one chunk of ingredient lists """
+    return Counter(itertools.chain.from_iterable(chunk))
+
+
+_shared_potions = ()
+
+
+def _share_potions(potions):
+    """ Worker initializer: keeps the potions a forked worker inherited """
+    global _shared_potions
+    _shared_potions = potions
+
+
+def _count_shared_potions(start: int, stop: int) -> Counter:
+    return _count_ingredients([potion.ingredients for potion in _shared_potions[start:stop]])
+
+
+def parallel_shopping_list(potions, workers: int = None,
+                           chunk_size: int = SHOPPING_CHUNK_SIZE * 16,
+                           vocabulary: IngredientVocabulary = None) -> Counter:
+    """ Same result as shopping_list, counted by a pool of worker processes
+
+    Workers count their chunk of potions by name. When the potions are a
+    sequence and processes can be forked, the workers inherit it and only
+    receive the bounds of their chunk, so the main process never touches
+    the ingredients. Otherwise (e.g. a generator) the ingredient lists of
+    every chunk are pickled to the workers. The partial counts hold one
+    entry per distinct ingredient and are added up by name; the
+    ingredients are interned once at the end.
+    """
+    vocabulary = ingredient_vocabulary if vocabulary is None else vocabulary
+    workers = workers or os.cpu_count() or 1
+    totals = Counter()
+
+    if isinstance(potions, Sequence) and 'fork' in multiprocessing.get_all_start_methods():
+        pool = ProcessPoolExecutor(workers, multiprocessing.get_context('fork'),
+                                   initializer=_share_potions, initargs=(potions,))
+        chunks = ((_count_shared_potions, start, start + chunk_size)
+                  for start in range(0, len(potions), chunk_size))
+    else:
+        pool = ProcessPoolExecutor(workers)
+        potions = iter(potions)
+        chunks = iter(lambda: [potion.ingredients
+                               for potion in itertools.islice(potions, chunk_size)], [])
+        chunks = ((_count_ingredients, chunk) for chunk in chunks)
+
+    with pool:
+        pending = deque()
+        max_pending = 2 * workers
+        for task in chunks:
+            pending.append(pool.submit(*task))
+            if len(pending) >= max_pending:
+                totals.update(pending.popleft().result())
+        while pending:
+            totals.update(pending.popleft().result())
+
+    # Same order as shopping_list: by ingredient id
+    return Counter({ingredient: totals[ingredient]
+                    for ingredient in sorted(totals, key=vocabulary.id)})
+
+
+class RecipeIndex:
+    """ Deduplicates potion recipes and finds recipes with similar ingredients
+
+    A recipe is the sorted tuple of the interned ids of its ingredients, so
+    potions listing the same ingredients in any order or with repetitions
+    share one recipe. Every recipe has a posting in the inverted index of
+    each of its ingredients, and a MinHash signature split into LSH bands
+    for approximate Jaccard queries.
+    """
+    _prime = (1 << 31) - 1
+
+    def __init__(self, potions=(), num_hashes: int = 32, bands: int = 16,
+                 vocabulary: IngredientVocabulary = None, seed: int = 0):
+        if num_hashes % bands:
+            raise ValueError("num_hashes must be a multiple of bands")
+        self._vocabulary = ingredient_vocabulary if vocabulary is None else vocabulary
+        self._recipes = []
+        self._recipe_ids = {}
+        self._potions = []
+        self._postings = {}
+        self._rows = num_hashes // bands
+        self._buckets = [{} for _ in range(bands)]
+        generator = random.Random(seed)
+        self._hash_parameters = [(generator.randrange(1, self._prime), generator.randrange(self._prime))
+                                 for _ in range(num_hashes)]
+        self._ingredient_hashes = {}
+        self.extend(potions)
+
+    def _hashes(self, ingredient_id: int) -> tuple:
+        try:
+            return self._ingredient_hashes[ingredient_id]
+        except KeyError:
+            prime = self._prime
+            hashes = self._ingredient_hashes[ingredient_id] = tuple(
+                (a * ingredient_id + b) % prime for a, b in self._hash_parameters)
+            return hashes
+
+    def _signature(self, ids) -> tuple:
+        """ MinHash signature: the smallest value of every hash over the ingredients """
+        return tuple(map(min, zip(*map(self._hashes, ids))))
+
+    def _bands(self, signature: tuple):
+        rows = self._rows
+        return (signature[start:start + rows] for start in range(0, len(signature), rows))
+
+    def _query_ids(self, potion) -> tuple:
+        """ Ids of the known ingredients of a potion and its number of distinct ingredients """
+        ingredients = set(potion.ingredients)
+        ids = {self._vocabulary._ids.get(ingredient) for ingredient in ingredients} - {None}
+        return ids, len(ingredients)
+
+    def add(self, potion) -> int:
+        """ Adds a potion and returns the id of its recipe """
+        recipe = tuple(sorted(set(self._vocabulary.ids(potion.ingredients))))
+        recipe_id = self._recipe_ids.get(recipe)
+        if recipe_id is not None:
+            self._potions[recipe_id].append(potion)
+            return recipe_id
+
+        recipe_id = self._recipe_ids[recipe] = len(self._recipes)
+        self._recipes.append(recipe)
+        self._potions.append([potion])
+        postings = self._postings
+        for ingredient_id in recipe:
+            if ingredient_id in postings:
+                postings[ingredient_id].append(recipe_id)
+            else:
+                postings[ingredient_id] = array('I', (recipe_id,))
+        for buckets, band in zip(self._buckets, self._bands(self._signature(recipe))):
+            if band in buckets:
+                buckets[band].append(recipe_id)
+            else:
+                buckets[band] = [recipe_id]
+        return recipe_id
+
+    def extend(self, potions):
+        for potion in potions:
+            self.add(potion)
+
+    def recipe(self, recipe_id: int) -> list:
+        """ Returns the sorted ingredient names of a recipe """
+        return sorted(map(self._vocabulary.name, self._recipes[recipe_id]))
+
+    def potions(self, recipe_id: int) -> list:
+        """ Returns all potions brewed from a recipe, in the order they were added """
+        return list(self._potions[recipe_id])
+
+    def duplicates(self) -> list:
+        """ Groups of potions that share a recipe """
+        return [list(potions) for potions in self._potions if len(potions) > 1]
+
+    def sharing(self, potion, k: int) -> list:
+        """ Recipe ids sharing at least k ingredients with a potion, most shared first """
+        ids, _ = self._query_ids(potion)
+        shared = Counter()
+        for ingredient_id in ids:
+            shared.update(self._postings.get(ingredient_id, ()))
+        return [recipe_id for recipe_id, count in shared.most_common() if count >= k]
+
+    def similar(self, potion, k: int = 5, min_jaccard: float = 0.0) -> list:
+        """ Approximate top-k recipes by Jaccard similarity of their ingredients
+
+        Candidates are the recipes sharing an LSH band with the potion, so
+        recipes with a low similarity may be missed. Candidates are ranked
+        by their exact Jaccard similarity. Returns (recipe id, similarity)
+        pairs, most similar first.
+        """
+        ids, size = self._query_ids(potion)
+        if not ids:
+            return []
+        candidates = set()
+        for buckets, band in zip(self._buckets, self._bands(self._signature(ids))):
+            candidates.update(buckets.get(band, ()))
+
+        scored = []
+        for recipe_id in candidates:
+            recipe = self._recipes[recipe_id]
+            shared = len(ids.intersection(recipe))
+            jaccard = shared / (size + len(recipe) - shared)
+            if jaccard >= min_jaccard:
+                scored.append((jaccard, -recipe_id))
+        return [(-recipe_id, jaccard) for jaccard, recipe_id in heapq.nlargest(k, scored)]
+
+    def __contains__(self, potion) -> bool:
+        ids, size = self._query_ids(potion)
+        return len(ids) == size and tuple(sorted(ids)) in self._recipe_ids
+
+    def __len__(self) -> int:
+        return len(self._recipes)
+
+
+class Roster:
+    """ Stores many Castle Kilmere members in compact, column-wise arrays
+
+    Every member occupies one row. Numbers live in typed arrays, repeated
+    strings (sex, subject, department) are interned and stored as small ids.
+    Rows are handed out as lightweight RosterRow views.
+    """
+    kinds = (CastleKilmereMember, Pupil, Professor, Ghost)
+    columns = ('birthyears', 'sexes', 'start_years', 'kinds', 'subjects',
+               'departments', 'years_of_death')
+    _no_year = -1
+
+    def __init__(self, members=()):
+        self._names = []
+        self._birthyears = array('h')
+        self._sexes = array('H')
+        self._start_years = array('h')
+        self._kinds = array('B')
+        self._subjects = array('H')
+        self._departments = array('H')
+        self._years_of_death = array('h')
+        self._trait_masks = []
+        self._false_masks = []
+
+        # id 0 is reserved for "no value"
+        self._strings = [None]
+        self._string_ids = {None: 0}
+
+        self.extend(members)
+
+    def _intern(self, value):
+        try:
+            return self._string_ids[value]
+        except KeyError:
+            string_id = self._string_ids[value] = len(self._strings)
+            self._strings.append(value)
+            return string_id
+
+    def add(self, kind, name: str, birthyear: int, sex: str, start_year: int = None,
+            subject: str = None, department: str = None, year_of_death: int = None,
+            trait_mask: int = 0, false_mask: int = 0) -> int:
+        """ Adds a member given by its class and attributes, returns its row """
+        no_year = self._no_year
+        self._kinds.append(self.kinds.index(kind))
+        self._names.append(name)
+        self._birthyears.append(birthyear)
+        self._sexes.append(self._intern(sex))
+        self._start_years.append(no_year if start_year is None else start_year)
+        self._subjects.append(self._intern(subject))
+        self._departments.append(self._intern(department))
+        self._years_of_death.append(no_year if year_of_death is None else year_of_death)
+        self._trait_masks.append(trait_mask)
+        self._false_masks.append(false_mask)
+        return len(self._names) - 1
+
+    def append(self, member: CastleKilmereMember) -> int:
+        """ Copies an existing member into the roster, returns its row """
+        # Compact classes remember the regular class they mirror
+        kind = getattr(type(member), '_regular', type(member))
+        if kind not in self.kinds:
+            try:
+                kind = next(k for k in reversed(self.kinds) if issubclass(kind, k))
+            except StopIteration:
+                raise TypeError(f"Cannot store {kind.__name__} objects in a roster") from None
+
+        return self.add(kind, member.name, member.birthyear, member.sex,
+                        start_year=getattr(member, 'start_year', None),
+                        subject=getattr(member, 'subject', None),
+                        department=getattr(member, 'department', None),
+                        year_of_death=getattr(member, 'year_of_death', None),
+                        trait_mask=member._trait_mask, false_mask=member._false_mask)
+
+    def extend(self, members):
+        for member in members:
+            self.append(member)
+
+    _string_columns = ('sexes', 'subjects', 'departments')
+
+    def _to_columns(self) -> dict:
+        """ The roster as plain values that marshal can store """
+        used = functools.reduce(int.__or__, itertools.chain(self._trait_masks, self._false_masks), 0)
+        columns = {name: getattr(self, '_' + name).tobytes() for name in self.columns}
+        columns.update(names=self._names, strings=self._strings,
+                       trait_masks=self._trait_masks, false_masks=self._false_masks,
+                       traits=trait_vocabulary._traits[:used.bit_length()])
+        return columns
+
+    def _extend_columns(self, columns: dict):
+        """ Appends the rows of another roster's _to_columns() """
+        string_ids = [self._intern(string) for string in columns['strings']]
+        same_strings = string_ids == list(range(len(string_ids)))
+        for name in self.columns:
+            column = getattr(self, '_' + name)
+            values = array(column.typecode, columns[name])
+            if name in self._string_columns and not same_strings:
+                values = array(column.typecode, map(string_ids.__getitem__, values))
+            column.extend(values)
+        self._names.extend(columns['names'])
+
+        bits = [trait_vocabulary.bit(trait) for trait in columns['traits']]
+        if bits == [1 << bit for bit in range(len(bits))]:
+            self._trait_masks.extend(columns['trait_masks'])
+            self._false_masks.extend(columns['false_masks'])
+            return
+
+        @functools.lru_cache(maxsize=None)
+        def translate(mask):
+            return functools.reduce(int.__or__, (bits[bit] for bit in _bit_positions(mask)), 0)
+        self._trait_masks.extend(map(translate, columns['trait_masks']))
+        self._false_masks.extend(map(translate, columns['false_masks']))
+
+    def column(self, name: str) -> memoryview:
+        """ Read-only view of a numeric column, e.g. 'birthyears' or 'kinds' """
+        if name not in self.columns:
+            raise ValueError(f"Unknown column '{name}', choose one of {self.columns}")
+        return memoryview(getattr(self, f"_{name}")).toreadonly()
+
+    def rows_of(self, kind):
+        """ Yields all rows of the given member class """
+        tag = self.kinds.index(kind)
+        for row, row_kind in enumerate(self._kinds):
+            if row_kind == tag:
+                yield RosterRow(self, row)
+
+    def count(self, kind) -> int:
+        return self._kinds.count(self.kinds.index(kind))
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __getitem__(self, row: int) -> 'RosterRow':
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("Roster row out of range")
+        return RosterRow(self, row)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield RosterRow(self, row)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({len(self)} members)"
+
+
+class RosterRow:
+    """ A lightweight view of one row of a Roster
+
+    Behaves like the member class stored in that row.
+    """
+    __slots__ = ('_roster', '_row')
+
+    def __init__(self, roster: Roster, row: int):
+        self._roster = roster
+        self._row = row
+
+    @property
+    def kind(self):
+        return self._roster.kinds[self._roster._kinds[self._row]]
+
+    @property
+    def name(self) -> str:
+        return self._roster._names[self._row]
+
+    @property
+    def birthyear(self) -> int:
+        return self._roster._birthyears[self._row]
+
+    @property
+    def sex(self) -> str:
+        return self._roster._strings[self._roster._sexes[self._row]]
+
+    def _only_for(self, kind, attribute):
+        if not issubclass(self.kind, kind):
+            raise AttributeError(f"'{self.kind.__name__}' row has no attribute '{attribute}'")
+
+    @property
+    def start_year(self) -> int:
+        self._only_for(Pupil, 'start_year')
+        return self._roster._start_years[self._row]
+
+    @property
+    def subject(self) -> str:
+        self._only_for(Professor, 'subject')
+        return self._roster._strings[self._roster._subjects[self._row]]
 
-    def __next__(self):
-        self.counter += 1
+    @property
+    def department(self) -> str:
+        self._only_for(Professor, 'department')
+        return self._roster._strings[self._roster._departments[self._row]]
+
+    @property
+    def year_of_death(self) -> int:
+        self._only_for(Ghost, 'year_of_death')
+        return self._roster._years_of_death[self._row]
+
+    @property
+    def age(self) -> int:
+        now = school_clock.year
+        return now - self.birthyear
 
-        if self.counter == len(self.ingredients):
-            raise StopIteration
+    @property
+    def current_year(self) -> int:
+        now = school_clock.year
+        return (now - self.start_year) + 1
+
+    def says(self, words: str) -> str:
+        return _said(self.name, words)
+
+    @property
+    def _trait_mask(self) -> int:
+        return self._roster._trait_masks[self._row]
+
+    @property
+    def _false_mask(self) -> int:
+        return self._roster._false_masks[self._row]
+
+    def add_trait(self, trait, value=True):
+        roster, row, bit = self._roster, self._row, trait_vocabulary.bit(trait)
+        if value:
+            roster._trait_masks[row] |= bit
+            roster._false_masks[row] &= ~bit
+        else:
+            roster._false_masks[row] |= bit
+            roster._trait_masks[row] &= ~bit
 
-        return self.ingredients[self.counter]
+    def exhibits_trait(self, trait: str) -> bool:
+        return bool(self._trait_mask & trait_vocabulary.lookup(trait))
+
+    def to_member(self) -> CastleKilmereMember:
+        """ Builds a full member object from this row """
+        kind = self.kind
+        if issubclass(kind, Pupil):
+            member = kind(self.name, self.birthyear, self.sex, self.start_year)
+        elif issubclass(kind, Professor):
+            member = kind(self.name, self.birthyear, self.sex, self.subject, self.department)
+        elif issubclass(kind, Ghost):
+            member = kind(self.name, self.birthyear, self.sex, self.year_of_death)
+        else:
+            member = kind(self.name, self.birthyear, self.sex)
+
+        member._trait_mask = self._trait_mask
+        member._false_mask = self._false_mask
+        # The roster does not keep the order traits were added in
+        member._trait_order = trait_vocabulary.traits(self._trait_mask | self._false_mask) or None
+        return member
+
+    def __repr__(self) -> str:
+        kind = self.kind
+        text = f"{kind.__name__}(name='{self.name}', birthyear={self.birthyear}, sex='{self.sex}'"
+        if issubclass(kind, Pupil):
+            return text + f", start_year={self.start_year})"
+        if issubclass(kind, Professor):
+            return text + f", subject='{self.subject}', department='{self.department}')"
+        if issubclass(kind, Ghost):
+            return text + f", year_of_death={self.year_of_death})"
+        return text + ")"
+
+
+def ages(members, as_of: int = None) -> array:
+    """ Computes the ages of many members at once
+
+    Reads the clock a single time. Rosters are computed straight from their
+    birthyear column.
+    """
+    now = school_clock.year if as_of is None else as_of
+
+    if isinstance(members, Roster):
+        birthyears = members._birthyears
+    else:
+        birthyears = [member.birthyear for member in members]
+
+    return array('i', [now - birthyear for birthyear in birthyears])
+
+
+def current_years(pupils, as_of: int = None) -> array:
+    """ Computes the current school year of many pupils at once
+
+    When given a Roster, only its pupil rows are used (in row order).
+    """
+    now = school_clock.year if as_of is None else as_of
+    next_year = now + 1
+
+    if isinstance(pupils, Roster):
+        pupil_tag = Roster.kinds.index(Pupil)
+        start_years = [start_year for start_year, kind
+                       in zip(pupils._start_years, pupils._kinds) if kind == pupil_tag]
+    else:
+        start_years = [pupil.start_year for pupil in pupils]
+
+    return array('i', [next_year - start_year for start_year in start_years])
+
+
+def members_with_traits(members, all_of=(), none_of=()):
+    """ Yields the members that exhibit all traits in `all_of` and none in `none_of`
+
+    For example all members that are kind and not evil:
+
+        members_with_traits(members, all_of=['kind'], none_of=['evil'])
+    """
+    wanted = trait_vocabulary.mask(all_of)
+    if all_of and not wanted:
+        return
+    unwanted = 0
+    for trait in none_of:
+        unwanted |= trait_vocabulary.lookup(trait)
+
+    if isinstance(members, Roster):
+        for row, mask in enumerate(members._trait_masks):
+            if mask & wanted == wanted and not mask & unwanted:
+                yield RosterRow(members, row)
+    else:
+        for member in members:
+            mask = member._trait_mask
+            if mask & wanted == wanted and not mask & unwanted:
+                yield member
+
+
+class TraitIndex:
+    """ Inverted index from traits to the members exhibiting them
+
+    Every member added gets a dense integer id. For each trait the index
+    keeps a bitmap of member ids, which add_trait() updates in place.
+    Queries combine the bitmaps as integers, so AND, OR and NOT cost a few
+    machine operations per 64 members.
+    """
+    def __init__(self, members=()):
+        self._members = []
+        self._ids = {}
+        self._everyone = bytearray()
+        self._bitmaps = {}
+        self._bitsets = {}
+
+        for member in members:
+            self.add(member)
+
+    @staticmethod
+    def _set(bitmap: bytearray, member_id: int, value: bool):
+        byte, bit = divmod(member_id, 8)
+        if byte >= len(bitmap):
+            bitmap.extend(bytes(byte - len(bitmap) + 1))
+        if value:
+            bitmap[byte] |= 1 << bit
+        else:
+            bitmap[byte] &= ~(1 << bit)
+
+    def add(self, member: CastleKilmereMember) -> int:
+        """ Adds a member to the index and returns its id """
+        if member._trait_index is not None:
+            raise ValueError(f"{member.name} is already part of a trait index")
+
+        member_id = self._ids[member] = len(self._members)
+        self._members.append(member)
+        member._trait_index = self
+        self._set(self._everyone, member_id, True)
+        self._bitsets.pop(None, None)
+
+        for trait in trait_vocabulary.traits(member._trait_mask):
+            self.update(member, trait, True)
+        return member_id
+
+    def remove(self, member: CastleKilmereMember):
+        member_id = self._ids.pop(member)
+        self._members[member_id] = None
+        member._trait_index = None
+
+        for bitmap in (self._everyone, *self._bitmaps.values()):
+            self._set(bitmap, member_id, False)
+        self._bitsets.clear()
+
+    def update(self, member: CastleKilmereMember, trait: str, value: bool):
+        """ Records that a member does or does not exhibit a trait """
+        bitmap = self._bitmaps.get(trait)
+        if bitmap is None:
+            if not value:
+                return
+            bitmap = self._bitmaps[trait] = bytearray()
+
+        self._set(bitmap, self._ids[member], value)
+        self._bitsets.pop(trait, None)
+
+    def _bitset(self, trait: str) -> int:
+        try:
+            return self._bitsets[trait]
+        except KeyError:
+            bitmap = self._everyone if trait is None else self._bitmaps.get(trait, b'')
+            bitset = self._bitsets[trait] = int.from_bytes(bitmap, 'little')
+            return bitset
+
+    def ids(self, all_of=(), any_of=(), none_of=()) -> int:
+        """ Returns the ids of all matching members as a bitset
+
+        Members match if they exhibit every trait in `all_of`, at least one
+        trait in `any_of` (when given) and no trait in `none_of`.
+        """
+        result = self._bitset(None)
+        for trait in all_of:
+            result &= self._bitset(trait)
+        if any_of:
+            alternatives = 0
+            for trait in any_of:
+                alternatives |= self._bitset(trait)
+            result &= alternatives
+        for trait in none_of:
+            result &= ~self._bitset(trait)
+        return result
+
+    def count(self, all_of=(), any_of=(), none_of=()) -> int:
+        return bin(self.ids(all_of, any_of, none_of)).count('1')
+
+    def query(self, all_of=(), any_of=(), none_of=()) -> list:
+        """ Returns the matching members, ordered by id """
+        members = self._members
+        return [members[i] for i in _bit_positions(self.ids(all_of, any_of, none_of))]
+
+    def __contains__(self, member) -> bool:
+        return member in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+class EligibilityMatrix:
+    """ Which pupils may learn which spells, as computed by eligibility_matrix()
+
+    Stores one bitset of pupil indices per spell.
+    """
+    def __init__(self, n_pupils: int, spell_bitsets: list):
+        self.n_pupils = n_pupils
+        self._bitsets = spell_bitsets
+
+    @property
+    def shape(self) -> tuple:
+        return (self.n_pupils, len(self._bitsets))
+
+    def __getitem__(self, pupil_and_spell) -> bool:
+        pupil, spell = pupil_and_spell
+        if not 0 <= pupil < self.n_pupils:
+            raise IndexError("Pupil index out of range")
+        return bool(self._bitsets[spell] >> pupil & 1)
+
+    def count(self, spell: int) -> int:
+        """ Number of pupils allowed to learn a spell """
+        return bin(self._bitsets[spell]).count('1')
+
+    def pupils_for(self, spell: int) -> list:
+        """ Indices of the pupils allowed to learn a spell """
+        return list(_bit_positions(self._bitsets[spell]))
+
+    def to_lists(self) -> list:
+        """ The full matrix as one list of booleans per pupil """
+        columns = [bin(bitset)[:1:-1].ljust(self.n_pupils, '0') for bitset in self._bitsets]
+        return [[column[pupil] == '1' for column in columns] for pupil in range(self.n_pupils)]
+
+
+def _bit_positions(bitset: int):
+    """ Yields the positions of the set bits, lowest first """
+    bits = bin(bitset)[:1:-1]
+    position = bits.find('1')
+    while position != -1:
+        yield position
+        position = bits.find('1', position + 1)
+
+
+def _bitset_from_flags(flags) -> int:
+    bitmap = bytearray((len(flags) + 7) // 8)
+    for i, flag in enumerate(flags):
+        if flag:
+            bitmap[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bitmap, 'little')
+
+
+def eligibility_matrix(pupils, spells, as_of: int = None) -> EligibilityMatrix:
+    """ Decides for every pupil and spell whether learn_spell() would succeed
+
+    The pupils are turned into columns (current year, highly intelligent,
+    evil) and every spell is then decided for all pupils at once with
+    bitset operations. Rosters are read straight from their columns.
+    """
+    if not isinstance(pupils, Roster):
+        pupils = list(pupils)
+    spells = list(spells)
+    years = current_years(pupils, as_of)
+
+    if isinstance(pupils, Roster):
+        pupil_tag = Roster.kinds.index(Pupil)
+        masks = [mask for mask, kind in zip(pupils._trait_masks, pupils._kinds)
+                 if kind == pupil_tag]
+    else:
+        masks = [pupil._trait_mask for pupil in pupils]
+
+    intelligent_bit = trait_vocabulary.lookup('highly intelligent')
+    evil_bit = trait_vocabulary.lookup('evil')
+    intelligent = _bitset_from_flags([mask & intelligent_bit for mask in masks])
+    evil = _bitset_from_flags([mask & evil_bit for mask in masks])
+
+    # Pupils in at least a given year, for every min_year asked for
+    min_years = sorted({spell.min_year for spell in spells if spell.min_year is not None})
+    at_least = {min_year: _bitset_from_flags([year >= min_year for year in years])
+                for min_year in min_years}
+
+    bitsets = []
+    for spell in spells:
+        if spell.min_year is not None:
+            bitsets.append(at_least[spell.min_year] | intelligent)
+        elif _LEARN_POLICIES[spell.kind] is _learn_dark_magic:
+            bitsets.append(evil)
+        else:
+            bitsets.append(0)
+    return EligibilityMatrix(len(years), bitsets)
+
+_ROSTER_TYPES = {'member': CastleKilmereMember, 'castlekilmeremember': CastleKilmereMember,
+                 'pupil': Pupil, 'professor': Professor, 'ghost': Ghost}
+
+
+def _roster_type(entry: dict):
+    """ The class of a roster entry, from its type key or else from its fields """
+    type_name = entry.get('type')
+    if type_name is not None:
+        try:
+            return _ROSTER_TYPES[str(type_name).lower()]
+        except KeyError:
+            raise ValueError(f"Unknown roster entry type: {type_name!r}") from None
+    if 'start_year' in entry:
+        return Pupil
+    if 'subject' in entry:
+        return Professor
+    if 'year_of_death' in entry:
+        return Ghost
+    return CastleKilmereMember
+
+
+def _roster_entries(document):
+    """ Entries of one YAML document: a single entry, a list or a mapping of entries """
+    if document is None:
+        return ()
+    if isinstance(document, list):
+        return document
+    if 'name' in document:
+        return (document,)
+    return document.values()
+
+
+def _add_roster_entries(roster, entries):
+    """ Adds entries given as dicts (like the ones in config.yaml) to a roster """
+    add = roster.add
+    for entry in entries:
+        trait_mask = false_mask = 0
+        for trait, value in (entry.get('traits') or {}).items():
+            if value:
+                trait_mask |= trait_vocabulary.bit(trait)
+            else:
+                false_mask |= trait_vocabulary.bit(trait)
+        add(_roster_type(entry), entry['name'], entry['birthyear'], entry['sex'],
+            start_year=entry.get('start_year'), subject=entry.get('subject'),
+            department=entry.get('department'), year_of_death=entry.get('year_of_death'),
+            trait_mask=trait_mask, false_mask=false_mask)
+    return roster
+
+
+def _yaml_loader():
+    import yaml
+    return yaml, getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def _parse_roster(path, roster):
+    yaml, loader = _yaml_loader()
+    with open(path, 'r', encoding='utf-8') as f:
+        for document in yaml.load_all(f, Loader=loader):
+            _add_roster_entries(roster, _roster_entries(document))
+    return roster
+
+
+def load_roster(path, roster=None, cache: bool = True):
+    """ Loads all members of a YAML file into a roster
+
+    Every document of the file may be a single entry, a list of entries
+    or a mapping of entries, as in config.yaml. An entry's `type` key
+    (member, pupil, professor or ghost) chooses its class; entries
+    without one are classified by their fields. Documents are parsed one
+    at a time, so splitting a large roster into several documents keeps
+    memory low. Attributes the roster has no column for, such as pets,
+    are skipped.
+
+    With cache=True the parsed columns are kept in <path>.roster.cache
+    and reused until the YAML file changes, see compiled_config().
+    """
+    roster = Roster() if roster is None else roster
+    if not cache:
+        return _parse_roster(path, roster)
+    roster._extend_columns(compiled_config(
+        path, 'roster', lambda path: _parse_roster(path, Roster())._to_columns()))
+    return roster
+
+
+def load_config(path, cache: bool = True):
+    """ Parses a YAML config file like config.yaml, see compiled_config() """
+    def parse(path):
+        yaml, loader = _yaml_loader()
+        with open(path, 'r', encoding='utf-8') as f:
+            return yaml.load(f, Loader=loader)
+    return compiled_config(path, 'config', parse) if cache else parse(path)
+
+
+CONFIG_CACHE_VERSION = 1
+
+
+def _file_digest(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(functools.partial(f.read, 1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_config_cache(cache_path: str, entry: tuple):
+    temporary = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, 'wb') as f:
+            f.write(marshal.dumps(entry))
+        os.replace(temporary, cache_path)
+    except (OSError, ValueError):
+        # Read-only directory or values marshal cannot store: stay uncached
+        with suppress(OSError):
+            os.remove(temporary)
+
+
+def compiled_config(path, kind: str, compile):
+    """ Returns compile(path), cached in a marshal file next to `path`
+
+    The cache file <path>.<kind>.cache remembers the Python version that
+    wrote it and the modification time, size and SHA-256 of the file it
+    was compiled from. It is used as is
+    while time and size match, after hashing the file if only the time
+    changed, and is rebuilt otherwise. Caches are replaced atomically,
+    so concurrent processes never read a half written one. The result
+    of compile must consist of values marshal can store, otherwise
+    nothing is cached.
+    """
+    path = os.fspath(path)
+    cache_path = f"{path}.{kind}.cache"
+    # marshal's format may change between Python versions
+    key = (CONFIG_CACHE_VERSION, kind, marshal.version, sys.version_info[:2])
+    stat = os.stat(path)
+
+    try:
+        with open(cache_path, 'rb') as f:
+            # loads() on the whole file is much faster than load() on the file
+            cached_key, mtime, size, digest, compiled = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        cached_key = None
+
+    if cached_key == key and size == stat.st_size:
+        if mtime == stat.st_mtime_ns:
+            return compiled
+        if digest == _file_digest(path):
+            _write_config_cache(cache_path, (key, stat.st_mtime_ns, size, digest, compiled))
+            return compiled
+
+    digest = _file_digest(path)
+    compiled = compile(path)
+    _write_config_cache(cache_path, (key, stat.st_mtime_ns, stat.st_size, digest, compiled))
+    return compiled
 
 
 if __name__ == "__main__":
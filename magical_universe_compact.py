@@ -0,0 +1,144 @@
+""" Compact versions of the Castle Kilmere classes
+
+Every class in this module has the same name and behaviour as its
+counterpart in magical_universe, but keeps its attributes in __slots__
+instead of a per-instance __dict__. Use them when holding a very large
+number of members or spells in memory:
+
+    from magical_universe_compact import Pupil, Charm
+"""
+import abc
+import types
+
+import magical_universe
+
+# Attributes that belong to the class machinery and must not be copied
+_NOT_COPIED = {'__dict__', '__weakref__', '__module__', '__qualname__', '__doc__',
+               '__slots__', '_abc_impl', '__abstractmethods__'}
+
+
+def _rebind(value, cls):
+    """ Makes zero-argument super() inside a copied method refer to cls """
+    if isinstance(value, (classmethod, staticmethod)):
+        return type(value)(_rebind(value.__func__, cls))
+
+    if isinstance(value, property):
+        return property(*(_rebind(f, cls) for f in (value.fget, value.fset, value.fdel)),
+                        value.__doc__)
+
+    if not isinstance(value, types.FunctionType) or '__class__' not in value.__code__.co_freevars:
+        return value
+
+    closure = tuple(types.CellType(cls) if name == '__class__' else cell
+                    for name, cell in zip(value.__code__.co_freevars, value.__closure__))
+    function = types.FunctionType(value.__code__, value.__globals__, value.__name__,
+                                  value.__defaults__, closure)
+    function.__kwdefaults__ = value.__kwdefaults__
+    function.__qualname__ = value.__qualname__
+    function.__doc__ = value.__doc__
+    function.__dict__.update(value.__dict__)
+    return function
+
+
+def _update_abstractmethods(cls):
+    """ Recomputes the abstract methods of an ABC after methods were set on it """
+    if not hasattr(cls, '__abstractmethods__'):
+        return
+    abstracts = {name for name, value in vars(cls).items()
+                 if getattr(value, '__isabstractmethod__', False)}
+    for base in cls.__bases__:
+        for name in getattr(base, '__abstractmethods__', ()):
+            if getattr(getattr(cls, name, None), '__isabstractmethod__', False):
+                abstracts.add(name)
+    cls.__abstractmethods__ = frozenset(abstracts)
+
+
+def compact_version_of(regular):
+    """ Class decorator copying methods and class attributes from `regular`
+
+    The decorated class only has to declare the __slots__ for the instance
+    attributes that `regular` sets.
+    """
+    def decorator(cls):
+        for name, value in vars(regular).items():
+            if name in _NOT_COPIED or name in vars(cls):
+                continue
+            setattr(cls, name, _rebind(value, cls))
+
+        cls.__doc__ = regular.__doc__
+        cls._regular = regular
+        _update_abstractmethods(cls)
+        return cls
+    return decorator
+
+
+@compact_version_of(magical_universe.CastleKilmereMember)
+class CastleKilmereMember:
+    __slots__ = ('name', 'birthyear', 'sex', '_trait_mask', '_false_mask', '_trait_order',
+                 '_trait_index', '_friendship_node', '__weakref__')
+
+    def __getstate__(self):
+        state = {name: getattr(self, name) for cls in type(self).__mro__
+                 for name in getattr(cls, '__slots__', ())
+                 if name != '__weakref__' and hasattr(self, name)}
+        state['_trait_index'] = state['_friendship_node'] = None
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+@compact_version_of(magical_universe.Professor)
+class Professor(CastleKilmereMember):
+    __slots__ = ('subject', 'department')
+
+
+@compact_version_of(magical_universe.Ghost)
+class Ghost(CastleKilmereMember):
+    __slots__ = ('year_of_death',)
+
+
+@compact_version_of(magical_universe.Pupil)
+class Pupil(CastleKilmereMember):
+    __slots__ = ('start_year', 'known_spells', 'pet_name', 'pet_type', '_elm_mask')
+
+
+@compact_version_of(magical_universe.Spell)
+class Spell(abc.ABC):
+    __slots__ = ('name', 'incantation', 'effect', 'difficulty', 'min_year', '_hash')
+
+
+@compact_version_of(magical_universe.Charm)
+class Charm(Spell):
+    __slots__ = ()
+
+
+@compact_version_of(magical_universe.Transfiguration)
+class Transfiguration(Spell):
+    __slots__ = ()
+
+
+@compact_version_of(magical_universe.Jinx)
+class Jinx(Spell):
+    __slots__ = ()
+
+
+@compact_version_of(magical_universe.Hex)
+class Hex(Spell):
+    __slots__ = ()
+
+
+@compact_version_of(magical_universe.Curse)
+class Curse(Spell):
+    __slots__ = ()
+
+
+@compact_version_of(magical_universe.CounterSpell)
+class CounterSpell(Spell):
+    __slots__ = ()
+
+
+@compact_version_of(magical_universe.HealingSpell)
+class HealingSpell(Spell):
+    __slots__ = ()
@@ -1,5 +1,8 @@
+import copy
+import pickle
 import pytest
-from magical_universe import Spell, Charm, Transfiguration, Hex, Curse, Jinx, HealingSpell, CounterSpell
+from dataclasses import FrozenInstanceError
+from magical_universe import Spell, SpellKind, Charm, Transfiguration, Hex, Curse, Jinx, HealingSpell, CounterSpell, spell_registry
 
 @pytest.fixture
 def stuporus_ratiato():
@@ -170,3 +173,49 @@ def test_repr_output_healing_spell(capfd, porim_perfite):
 def test_healing_spell_defining_feature(porim_perfite):
     assert porim_perfite.defining_feature == "Improves the condition of a living object"
 
+
+def test_kind_tags(stuporus_ratiato, alteraror_canieo, rectaro, fiera_satanotis, inceptotis,
+                   porim_perfite, mufindo_immolim):
+    assert stuporus_ratiato.kind == SpellKind.CHARM
+    assert alteraror_canieo.kind == SpellKind.TRANSFIGURATION
+    assert rectaro.kind == SpellKind.HEX
+    assert fiera_satanotis.kind == SpellKind.CURSE
+    assert inceptotis.kind == SpellKind.JINX
+    assert porim_perfite.kind == SpellKind.HEALING_SPELL
+    assert mufindo_immolim.kind == SpellKind.COUNTER_SPELL
+
+def test_subclasses_inherit_kind_tag():
+    class MinorHex(Hex):
+        pass
+    assert MinorHex('The Minor hex', 'Minoro', 'Itches').kind == SpellKind.HEX
+
+def test_canonical_spells_are_shared(stuporus_ratiato):
+    assert Charm.stuporus_ratiato() is stuporus_ratiato
+    assert spell_registry.get(Charm, 'The Stuporus Ratiato charm') is stuporus_ratiato
+    assert stuporus_ratiato in spell_registry
+
+def test_spells_compare_by_value(stuporus_ratiato):
+    copy = Charm('The Stuporus Ratiato charm', 'Stuporus Ratiato', 'Makes objects fly')
+    assert copy == stuporus_ratiato
+    assert hash(copy) == hash(stuporus_ratiato)
+    assert len({copy, stuporus_ratiato}) == 1
+    assert copy != Charm('The Stuporus Ratiato charm', 'Stuporus Ratiato', 'Makes objects fly', min_year=2)
+    assert copy != Jinx('The Stuporus Ratiato charm', 'Stuporus Ratiato', 'Makes objects fly')
+
+def test_registry_intern_returns_canonical_instance(stuporus_ratiato):
+    copy = Charm('The Stuporus Ratiato charm', 'Stuporus Ratiato', 'Makes objects fly')
+    assert spell_registry.intern(copy) is stuporus_ratiato
+
+def test_spells_are_immutable(stuporus_ratiato):
+    with pytest.raises(FrozenInstanceError):
+        stuporus_ratiato.min_year = 3
+    with pytest.raises(FrozenInstanceError):
+        del stuporus_ratiato.name
+
+@pytest.mark.parametrize('spell', [Charm.liberula(), Hex.rectaro(), Curse.fiera_satanotis(),
+                                   Charm('A new charm', 'Novum', 'Makes things new')])
+def test_copy_and_pickle_spells(spell):
+    for duplicate in (copy.copy(spell), copy.deepcopy(spell), pickle.loads(pickle.dumps(spell))):
+        assert duplicate == spell
+        assert type(duplicate) is type(spell)
+        assert hash(duplicate) == hash(spell)
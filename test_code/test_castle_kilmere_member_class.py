@@ -1,5 +1,6 @@
 import pytest
-from magical_universe import CastleKilmereMember
+from magical_universe import (CastleKilmereMember, UTTERANCE_CACHE_SIZE, utterance_cache_info,
+                              clear_utterance_caches)
 import datetime
 
 now = datetime.datetime.now().year
@@ -61,3 +62,52 @@ def test_repr_output(capfd, bromley):
     stdout = stdout.strip()
     assert stdout == "CastleKilmereMember(name='Bromley Huckabee', birthyear=1956, sex='male')"
 
+
+class WhisperingMember(CastleKilmereMember):
+    @CastleKilmereMember.whisper
+    def says(self, words: str) -> str:
+        return f"{self.name} says: {words}"
+
+def test_whisper():
+    bromley = WhisperingMember('Bromley Huckabee', 1956, 'male')
+    assert bromley.says("Hi Lissy!") == "Bromley Huckabee whispers: Hi Lissy..."
+    assert bromley.says.__name__ == 'says'
+
+class ShoutingMember(CastleKilmereMember):
+    @CastleKilmereMember.whisper
+    def says(self, words: str, times: int = 1) -> str:
+        return f"{self.name} says: {' '.join([words.upper()] * times)}!"
+
+def test_whisper_transforms_the_decorated_output():
+    bromley = ShoutingMember('Bromley Huckabee', 1956, 'male')
+    assert bromley.says("hi") == "Bromley Huckabee whispers: HI..."
+    assert bromley.says("hi", 2) == "Bromley Huckabee whispers: HI HI..."
+
+def test_utterances_are_cached(bromley):
+    clear_utterance_caches()
+    first = bromley.says("Hi Lissy!")
+    second = bromley.says("Hi Lissy!")
+    assert first is second
+    info = utterance_cache_info()['says']
+    assert (info.hits, info.misses) == (1, 1)
+    assert info.maxsize == UTTERANCE_CACHE_SIZE
+
+def test_print_traits_keeps_the_members_own_order(capfd):
+    CastleKilmereMember('Someone Else', 1960, 'female').add_trait('tidy-minded')
+    member = CastleKilmereMember('Bromley Huckabee', 1956, 'male')
+    member.add_trait('kind')
+    member.add_trait('tidy-minded')
+    member.add_trait('kind', False)
+    member.print_traits()
+    stdout, _ = capfd.readouterr()
+    assert stdout.splitlines() == ["Bromley Huckabee is tidy-minded.", "Bromley Huckabee is not kind."]
+    assert list(member._traits) == ['kind', 'tidy-minded']
+
+def test_print_traits_is_independent_of_other_members(capfd):
+    CastleKilmereMember('Someone Else', 1960, 'female').add_trait('tidy-minded')
+    member = CastleKilmereMember('Bromley Huckabee', 1956, 'male')
+    member.add_trait('kind')
+    member.add_trait('tidy-minded')
+    member.print_traits()
+    stdout, _ = capfd.readouterr()
+    assert stdout.strip() == "Bromley Huckabee is kind, tidy-minded."
@@ -0,0 +1,94 @@
+import copy
+import pickle
+import pytest
+import datetime
+import magical_universe
+from magical_universe import Roster
+from magical_universe_compact import (CastleKilmereMember, Pupil, Professor, Ghost, Spell,
+                                      Charm, Transfiguration, Jinx, Hex, Curse, CounterSpell,
+                                      HealingSpell)
+
+now = datetime.datetime.now().year
+
+@pytest.fixture
+def luke():
+    return Pupil.luke()
+
+@pytest.fixture
+def bromley():
+    return CastleKilmereMember('Bromley Huckabee', 1956, 'male')
+
+@pytest.mark.parametrize('instance', [
+    CastleKilmereMember('Bromley Huckabee', 1956, 'male'),
+    Pupil.luke(), Professor.blade(), Ghost.mocking_knight(),
+    Charm.stuporus_ratiato(), Transfiguration.alteraror_canieo(), Jinx.inceptotis(),
+    Hex.rectaro(), Curse.fiera_satanotis(), CounterSpell.mufindo_immolim(),
+    HealingSpell.porim_perfite()])
+def test_instances_have_no_dict(instance):
+    assert not hasattr(instance, '__dict__')
+
+def test_classmethods_build_compact_instances(luke):
+    assert type(luke) is Pupil
+    assert isinstance(luke, CastleKilmereMember)
+
+def test_repr_matches_regular_class(luke):
+    assert repr(luke) == repr(magical_universe.Pupil.luke())
+    assert repr(Ghost.mocking_knight()) == repr(magical_universe.Ghost.mocking_knight())
+
+def test_says_and_age(bromley):
+    assert bromley.says("Hi Lissy!") == "Bromley Huckabee says: Hi Lissy!"
+    assert bromley.age == (now - bromley.birthyear)
+
+def test_traits(capfd, bromley):
+    bromley.add_trait('kind')
+    bromley.add_trait('mean', False)
+    bromley.print_traits()
+    stdout, err = capfd.readouterr()
+    assert stdout.strip() == 'Bromley Huckabee is kind.\nBromley Huckabee is not mean.'
+    assert bromley.exhibits_trait('kind') == True
+    assert bromley.exhibits_trait('smart') == False
+
+def test_pet_is_optional():
+    pupil = Pupil('Lissy Spinster', 2008, 'female', 2020)
+    with pytest.raises(AttributeError):
+        pupil.pet_name
+
+def test_learn_and_cast_spell(capfd, luke):
+    spell = Charm.stuporus_ratiato()
+    luke.learn_spell(spell)
+    stdout, err = capfd.readouterr()
+    assert stdout.strip() == "Luke Bery now knows 'The Stuporus Ratiato charm'"
+    assert luke.cast_spell(spell) == 'Luke Bery: Stuporus Ratiato!'
+
+def test_learn_hex_if_not_being_evil(capfd, luke):
+    luke.learn_spell(Hex.rectaro())
+    stdout, err = capfd.readouterr()
+    assert stdout.strip() == 'How dare you study a hex or curse?!'
+
+def test_delete_elms(capfd, luke):
+    del luke.elms
+    with pytest.raises(AttributeError):
+        luke.elms
+
+def test_instantiating_base_class_raises_exception():
+    with pytest.raises(TypeError):
+        Spell()
+
+def test_cast_spell():
+    assert Hex.rectaro().cast() == 'Rectaro!'
+
+def test_roster_accepts_compact_members(luke):
+    roster = Roster([luke])
+    assert repr(roster[0]) == repr(luke)
+
+def test_compact_spells_are_canonical_and_distinct_from_regular_ones():
+    assert Charm.liberula() is Charm.liberula()
+    assert Charm.liberula() != magical_universe.Charm.liberula()
+    assert Charm.liberula() == Charm('The Liberula charm', 'Liberula',
+                                     'Allows a person to breath under water', 'Difficult', 5)
+
+def test_copy_and_pickle_compact_spells():
+    for spell in (Charm.liberula(), Hex.rectaro()):
+        for duplicate in (copy.copy(spell), copy.deepcopy(spell), pickle.loads(pickle.dumps(spell))):
+            assert duplicate == spell
+            assert type(duplicate) is type(spell)
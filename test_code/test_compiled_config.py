@@ -0,0 +1,89 @@
+import marshal
+import os
+import shutil
+import pytest
+from magical_universe import Roster, Pupil, compiled_config, load_config, load_roster
+
+yaml = pytest.importorskip('yaml')
+
+CONFIG = os.path.join(os.path.dirname(__file__), '..', 'config.yaml')
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / 'config.yaml'
+    shutil.copy(CONFIG, path)
+    return path
+
+@pytest.fixture
+def compile_calls():
+    calls = []
+    def compile(path):
+        calls.append(path)
+        with open(path) as f:
+            return f.read().upper()
+    return calls, compile
+
+def test_cache_is_reused_until_file_changes(config, compile_calls):
+    calls, compile = compile_calls
+    first = compiled_config(config, 'upper', compile)
+    assert compiled_config(config, 'upper', compile) == first
+    assert len(calls) == 1
+    assert (config.parent / 'config.yaml.upper.cache').exists()
+
+    config.write_text(config.read_text() + "\nghost:\n    name: 'The Gray Groom'\n")
+    assert 'THE GRAY GROOM' in compiled_config(config, 'upper', compile)
+    assert len(calls) == 2
+
+def test_touched_file_with_same_content_is_not_recompiled(config, compile_calls):
+    calls, compile = compile_calls
+    compiled_config(config, 'upper', compile)
+    stat = os.stat(config)
+    os.utime(config, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    compiled_config(config, 'upper', compile)
+    compiled_config(config, 'upper', compile)
+    assert len(calls) == 1
+
+def test_corrupt_cache_is_rebuilt(config, compile_calls):
+    calls, compile = compile_calls
+    (config.parent / 'config.yaml.upper.cache').write_bytes(b'not marshal')
+    assert compiled_config(config, 'upper', compile) == config.read_text().upper()
+    assert compiled_config(config, 'upper', compile) == config.read_text().upper()
+    assert len(calls) == 1
+
+def test_load_config(config):
+    assert load_config(config) == load_config(config, cache=False)
+    assert load_config(config)['lissy']['pet'] == ['Ramses', 'cat']
+
+def test_load_roster_from_cache(config):
+    load_roster(config).rows_of(Pupil)
+    roster = load_roster(config)
+    assert (config.parent / 'config.yaml.roster.cache').exists()
+    assert [row.name for row in roster] == ['Bromley Huckabee', 'Luke Bery', 'Lissy Spinster']
+    assert roster[2].kind is Pupil
+    assert roster[2].sex == 'female'
+
+def test_cached_roster_into_existing_roster(config):
+    roster = Roster()
+    roster.add(Pupil, 'Adrien Fulford', 2008, 'male', 2020, department=None)
+    roster.add(Pupil, 'Cassidy Ambergem', 2007, 'female', 2020, subject='Potions')
+    load_roster(config)
+    load_roster(config, roster)
+    assert [row.sex for row in roster] == ['male', 'female', 'male', 'male', 'female']
+
+def test_cached_roster_keeps_traits(tmp_path):
+    path = tmp_path / 'roster.yaml'
+    path.write_text("name: Luke Bery\nbirthyear: 2008\nsex: male\nstart_year: 2020\n"
+                    "traits:\n  brave: true\n  rare trait for the cache: false\n")
+    load_roster(path)
+    roster = load_roster(path)
+    assert roster[0].exhibits_trait('brave')
+    assert not roster[0].exhibits_trait('rare trait for the cache')
+
+def test_cache_of_another_python_version_is_rebuilt(config, compile_calls):
+    calls, compile = compile_calls
+    compiled_config(config, 'upper', compile)
+    cache = config.parent / 'config.yaml.upper.cache'
+    key, *rest = marshal.loads(cache.read_bytes())
+    cache.write_bytes(marshal.dumps(((*key[:-1], (2, 7)), *rest)))
+    compiled_config(config, 'upper', compile)
+    assert len(calls) == 2
@@ -0,0 +1,57 @@
+import pytest
+from magical_universe import (Pupil, Roster, Charm, Transfiguration, Jinx, Hex, Curse,
+                              CounterSpell, HealingSpell, Outcome, NullSink, event_sink,
+                              school_clock, eligibility_matrix)
+
+@pytest.fixture
+def pupils():
+    pupils = [Pupil('Luke Bery', 2008, 'male', 2020),
+              Pupil('Lissy Spinster', 2008, 'female', 2024),
+              Pupil('Adrien Fulford', 2008, 'male', 2024),
+              Pupil('Cecile Cuthbert', 2010, 'female', 2025)]
+    pupils[1].add_trait('highly intelligent')
+    pupils[2].add_trait('evil')
+    pupils[3].add_trait('evil')
+    pupils[3].add_trait('highly intelligent')
+    return pupils
+
+@pytest.fixture
+def spells():
+    return [Charm.stuporus_ratiato(), Charm.liberula(), Transfiguration.alteraror_canieo(),
+            Jinx.inceptotis(), Hex.rectaro(), Curse.fiera_satanotis(),
+            CounterSpell.mufindo_immolim(), HealingSpell.porim_perfite(),
+            Charm('The Nameless charm', 'Nameless', 'Does nothing', min_year=None)]
+
+def learned(pupils, spells):
+    with event_sink(NullSink()):
+        return [[pupil.learn_spell(spell) == Outcome.LEARNED for spell in spells]
+                for pupil in pupils]
+
+def test_matches_learn_spell(pupils, spells):
+    with school_clock(year=2026):
+        expected = learned(pupils, spells)
+        matrix = eligibility_matrix(pupils, spells)
+    assert matrix.to_lists() == expected
+    assert matrix.shape == (4, 9)
+
+def test_matches_learn_spell_for_roster(pupils, spells):
+    with school_clock(year=2026):
+        assert eligibility_matrix(Roster(pupils), spells).to_lists() == learned(pupils, spells)
+
+def test_queries(pupils, spells):
+    matrix = eligibility_matrix(pupils, spells, as_of=2026)
+    assert matrix[0, 1] == True
+    assert matrix[2, 1] == False
+    assert matrix.pupils_for(4) == [2, 3]
+    assert matrix.count(1) == 3
+
+def test_index_out_of_range_raises_exception(pupils, spells):
+    matrix = eligibility_matrix(pupils, spells, as_of=2026)
+    with pytest.raises(IndexError):
+        matrix[4, 0]
+
+def test_accepts_generators(pupils, spells):
+    with school_clock(year=2026):
+        matrix = eligibility_matrix((pupil for pupil in pupils), iter(spells))
+        assert matrix.to_lists() == learned(pupils, spells)
+    assert matrix.shape == (4, 9)
@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+import pytest
+from magical_universe import (Outcome, Event, NullSink, RingBufferSink, BatchedFileSink,
+                              event_sink, set_event_sink, Pupil, Charm, Hex, Curse)
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+@pytest.fixture
+def luke():
+    return Pupil.luke()
+
+@pytest.fixture
+def lissy():
+    return Pupil.lissy()
+
+@pytest.fixture
+def buffer():
+    return RingBufferSink(capacity=3)
+
+def test_methods_return_outcomes(capfd, luke, lissy):
+    assert luke.learn_spell(Charm.stuporus_ratiato()) == Outcome.LEARNED
+    assert luke.learn_spell(Hex.rectaro()) == Outcome.DARK_STUDY_REFUSED
+    assert luke.cast_spell(Curse.fiera_satanotis()) == Outcome.CURSE_REFUSED
+    assert luke.cast_spell(Charm.liberula()) == Outcome.NOT_STUDIED
+    assert luke.befriend(lissy) == Outcome.BEFRIENDED
+
+def test_null_sink_prints_nothing(capfd, luke, lissy):
+    with event_sink(NullSink()):
+        luke.learn_spell(Hex.rectaro())
+        luke.befriend(lissy)
+        luke.elms = ('Potions', 'H')
+        del luke.elms
+    stdout, err = capfd.readouterr()
+    assert stdout == ''
+
+def test_ring_buffer_keeps_latest_events(capfd, luke, lissy, buffer):
+    with event_sink(buffer):
+        luke.befriend(lissy)
+        luke.elms = ('Potions', 'E')
+        luke.elms = ('Charms', 'H')
+        luke.learn_spell(Hex.rectaro())
+    stdout, err = capfd.readouterr()
+    assert stdout == ''
+    assert [event.outcome for event in buffer.events] == [Outcome.ELM_AWARDED,
+                                                          Outcome.ELM_NOT_AWARDED,
+                                                          Outcome.DARK_STUDY_REFUSED]
+    assert buffer.events[0] == Event(Outcome.ELM_AWARDED, luke, 'Potions')
+
+def test_event_message(luke, lissy):
+    assert Event(Outcome.BEFRIENDED, luke, lissy).message == "Lissy Spinster is now your friend!"
+    assert Event(Outcome.ELM_AWARDED, luke, 'Potions').message is None
+
+def test_sink_is_restored(capfd, luke, lissy, buffer):
+    with event_sink(buffer):
+        pass
+    luke.befriend(lissy)
+    stdout, err = capfd.readouterr()
+    assert stdout.strip() == "Lissy Spinster is now your friend!"
+
+def test_set_event_sink_returns_previous_sink(buffer):
+    previous = set_event_sink(buffer)
+    assert set_event_sink(previous) is buffer
+
+def test_batched_file_sink(tmp_path, luke, lissy):
+    path = tmp_path / 'events.txt'
+    with BatchedFileSink(path, batch_size=2) as sink, event_sink(sink):
+        luke.befriend(lissy)
+        assert not path.exists()
+        luke.learn_spell(Hex.rectaro())
+        assert path.exists()
+        luke.elms = ('Potions', 'E')
+    assert path.read_text().splitlines() == ["Lissy Spinster is now your friend!",
+                                             "How dare you study a hex or curse?!",
+                                             "Luke Bery: ELM_AWARDED"]
+
+def test_hex_cast_and_not_learnable_outcomes(capfd, luke):
+    luke.add_trait('evil')
+    assert luke.cast_spell(Hex.rectaro()) == Outcome.HEX_CAST
+    assert luke.learn_spell(Charm('The Nameless charm', 'Nameless', 'Does nothing',
+                                  min_year=None)) == Outcome.NOT_LEARNABLE
+    stdout, err = capfd.readouterr()
+    assert stdout == ''
+
+def test_batched_file_sink_is_flushed_at_exit(tmp_path):
+    path = tmp_path / 'events.txt'
+    script = (f"import sys; sys.path.insert(0, {ROOT!r})\n"
+              "from magical_universe import BatchedFileSink, Pupil, set_event_sink\n"
+              f"set_event_sink(BatchedFileSink({str(path)!r}))\n"
+              "Pupil.luke().befriend(Pupil.lissy())\n")
+    subprocess.run([sys.executable, '-c', script], check=True)
+    assert path.read_text() == "Lissy Spinster is now your friend!\n"
@@ -0,0 +1,160 @@
+import copy
+import gc
+import pickle
+import weakref
+import pytest
+import magical_universe
+import magical_universe_compact
+from magical_universe import (FriendshipGraph, Pupil, Outcome, NullSink, event_sink,
+                              school_friendships, DarkArmyMember, Roster, TraitIndex)
+
+
+@pytest.fixture
+def graph():
+    return FriendshipGraph()
+
+@pytest.fixture
+def pupils():
+    return [Pupil(f'Pupil {i}', 2008, 'female', 2020) for i in range(6)]
+
+
+def test_befriend_adds_friend_once(graph, pupils):
+    a, b = pupils[:2]
+    assert graph.befriend(a, b)
+    assert not graph.befriend(a, b)
+    assert graph.friends_of(a) == [b]
+    assert graph.are_friends(a, b)
+    assert not graph.are_friends(b, a)
+
+def test_friends_of_unknown_member_is_empty(graph, pupils):
+    assert graph.friends_of(pupils[0]) == []
+    assert pupils[0] not in graph
+
+def test_friends_keep_befriending_order(graph, pupils):
+    a, b, c, d = pupils[:4]
+    for friend in (d, b, c):
+        graph.befriend(a, friend)
+    assert graph.friends_of(a) == [d, b, c]
+
+def test_mutual_friends(graph, pupils):
+    a, b, c, d, e = pupils[:5]
+    for friend in (c, d, e):
+        graph.befriend(a, friend)
+    for friend in (e, c):
+        graph.befriend(b, friend)
+    assert graph.mutual_friends(a, b) == [c, e]
+    assert graph.mutual_friends(a, pupils[5]) == []
+
+def test_degrees_of_separation(graph, pupils):
+    a, b, c, d, e, f = pupils
+    graph.befriend(a, b)
+    graph.befriend(c, b)
+    graph.befriend(c, d)
+    assert graph.degrees_of_separation(a, a) == 0
+    assert graph.degrees_of_separation(a, b) == 1
+    assert graph.degrees_of_separation(a, d) == 3
+    assert graph.degrees_of_separation(d, a) == 3
+    assert graph.degrees_of_separation(a, e) is None
+    assert graph.degrees_of_separation(e, f) is None
+
+def test_connected_components(graph, pupils):
+    a, b, c, d, e, f = pupils
+    graph.befriend(a, b)
+    graph.befriend(c, b)
+    graph.befriend(d, e)
+    graph.node(f)
+    components = graph.connected_components()
+    assert [set(component) for component in components] == [{a, b, c}, {d, e}, {f}]
+    assert len(graph) == 6
+
+def test_pupil_befriend_is_a_view_on_school_friendships(pupils):
+    a, b = pupils[:2]
+    with event_sink(NullSink()):
+        assert a.befriend(b) == Outcome.BEFRIENDED
+        assert a.befriend(b) == Outcome.ALREADY_FRIENDS
+    assert school_friendships.friends_of(a) == [b]
+    assert a.friends == "Pupil 0's current friends are: ['Pupil 1']"
+
+def test_befriending_twice_prints_message(capfd, pupils):
+    a, b = pupils[:2]
+    a.befriend(b)
+    a.befriend(b)
+    stdout, _ = capfd.readouterr()
+    assert stdout.splitlines()[-1] == "Pupil 1 is already your friend!"
+
+def test_members_are_not_kept_alive_by_the_graph(graph):
+    a, b = Pupil('A', 2008, 'female', 2020), Pupil('B', 2008, 'male', 2020)
+    graph.befriend(a, b)
+    a_ref, b_ref = weakref.ref(a), weakref.ref(b)
+    del a, b
+    gc.collect()
+    assert a_ref() is None and b_ref() is None
+    assert len(graph) == 0
+
+def test_friends_stay_alive_while_befriended(graph):
+    a, b = Pupil('A', 2008, 'female', 2020), Pupil('B', 2008, 'male', 2020)
+    graph.befriend(a, b)
+    b_ref = weakref.ref(b)
+    del b
+    gc.collect()
+    assert graph.friends_of(a) == [b_ref()]
+    del a
+    gc.collect()
+    assert b_ref() is None
+
+def test_node_ids_are_reused(graph, pupils):
+    graph.befriend(Pupil('A', 2008, 'female', 2020), pupils[0])
+    gc.collect()
+    assert len(graph) == 1
+    graph.befriend(pupils[1], pupils[0])
+    assert len(graph) == 2
+    assert graph.friends_of(pupils[1]) == [pupils[0]]
+    assert [set(component) for component in graph.connected_components()] == [{pupils[0], pupils[1]}]
+
+def test_member_belongs_to_one_graph(graph, pupils):
+    graph.befriend(pupils[0], pupils[1])
+    with pytest.raises(ValueError):
+        FriendshipGraph().befriend(pupils[0], pupils[2])
+    graph.clear()
+    FriendshipGraph().befriend(pupils[0], pupils[2])
+
+def test_compact_pupils_can_be_friends(graph):
+    a = magical_universe_compact.Pupil('A', 2008, 'female', 2020)
+    b = magical_universe_compact.Pupil('B', 2008, 'male', 2020)
+    assert graph.befriend(a, b)
+    assert graph.friends_of(a) == [b]
+    a_ref = weakref.ref(a)
+    del a
+    gc.collect()
+    assert a_ref() is None
+    assert len(graph) == 1
+
+
+def test_non_members_can_be_friends(graph, pupils):
+    roster = Roster(pupils[:1])
+    odon, row = DarkArmyMember('Master Odon', 1971), roster[0]
+    assert graph.befriend(pupils[1], odon)
+    assert graph.befriend(odon, row)
+    assert not graph.befriend(pupils[1], odon)
+    assert graph.friends_of(pupils[1]) == [odon]
+    assert graph.friends_of(odon) == [row]
+    assert graph.degrees_of_separation(pupils[1], row) == 2
+    assert graph.mutual_friends(pupils[1], pupils[1]) == [odon]
+
+def test_pupil_befriends_a_dark_army_member(pupils):
+    odon = DarkArmyMember('Master Odon', 1971)
+    with event_sink(NullSink()):
+        assert pupils[0].befriend(odon) is Outcome.BEFRIENDED
+    assert school_friendships.friends_of(pupils[0]) == [odon]
+
+@pytest.mark.parametrize("module", [magical_universe, magical_universe_compact])
+def test_copies_and_pickles_leave_the_graph_behind(graph, module):
+    a, b, c = (module.Pupil(name, 2008, 'female', 2020) for name in 'ABC')
+    graph.befriend(a, b)
+    TraitIndex([a])
+    for clone in (copy.copy(a), copy.deepcopy(a), pickle.loads(pickle.dumps(a))):
+        assert clone.name == 'A' and clone not in graph
+        assert clone._trait_index is None
+        graph.befriend(clone, c)
+        assert graph.friends_of(clone) == [c]
+    assert graph.friends_of(a) == [b]
@@ -0,0 +1,132 @@
+import pytest
+from magical_universe import (CastleKilmereMember, LetterArchive, SegmentLetterWriter,
+                              compact_letter_archive, letter_writer)
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = LetterArchive(tmp_path)
+    archive.write('Lissy', 'Hello Lissy!')
+    archive.write('Bromley', 'Hello Bromley!')
+    archive.write('Lissy', 'Goodbye Lissy!')
+    yield archive
+    archive.close()
+
+def test_letters_to_recipient_before_flush(archive):
+    assert archive.letters_to('Lissy') == ['Hello Lissy!', 'Goodbye Lissy!']
+
+def test_letters_to_recipient_after_flush(archive):
+    archive.flush()
+    assert archive.letters_to('Lissy') == ['Hello Lissy!', 'Goodbye Lissy!']
+    assert archive.letters_to('Bromley') == ['Hello Bromley!']
+    assert archive.letters_to('Luke') == []
+
+def test_views_are_slices_of_the_data_file(archive):
+    archive.flush()
+    views = archive.views('Bromley')
+    assert isinstance(views[0], memoryview)
+    assert views[0] == b'Hello Bromley!'
+
+def test_index_and_pending_letters_are_combined(archive):
+    archive.flush()
+    archive.write('Lissy', 'Hello again!')
+    assert archive.letters_to('Lissy') == ['Hello Lissy!', 'Goodbye Lissy!', 'Hello again!']
+    assert archive.recipients() == ['Bromley', 'Lissy']
+
+def test_archive_can_be_reopened(tmp_path, archive):
+    archive.close()
+    with LetterArchive(tmp_path) as reopened:
+        assert reopened.letters_to('Lissy') == ['Hello Lissy!', 'Goodbye Lissy!']
+        reopened.write('Bromley', 'Bye Bromley!')
+    with LetterArchive(tmp_path) as reopened:
+        assert reopened.letters_to('Bromley') == ['Hello Bromley!', 'Bye Bromley!']
+
+def test_remove_and_compact(tmp_path, archive):
+    archive.flush()
+    archive.remove('Lissy')
+    assert archive.letters_to('Lissy') == []
+    archive.write('Lissy', 'New letter')
+    size_before = sum(path.stat().st_size for path in tmp_path.glob('*.dat'))
+    archive.compact()
+    assert archive.letters_to('Lissy') == ['New letter']
+    assert archive.letters_to('Bromley') == ['Hello Bromley!']
+    assert [path.name for path in tmp_path.glob('*.dat')] == ['letters-00001.dat']
+    assert (tmp_path / 'letters-00001.dat').stat().st_size < size_before
+
+def test_compact_keeps_earlier_views_valid(archive):
+    archive.flush()
+    view = archive.views('Lissy')[0]
+    archive.compact()
+    assert view == b'Hello Lissy!'
+
+def test_compact_letter_archive(tmp_path, archive):
+    archive.remove('Bromley')
+    archive.close()
+    compact_letter_archive(tmp_path)
+    with LetterArchive(tmp_path) as reopened:
+        assert reopened.recipients() == ['Lissy']
+
+def test_unicode_recipients(archive):
+    archive.write('Zoë', 'Grüße!')
+    archive.flush()
+    assert archive.letters_to('Zoë') == ['Grüße!']
+
+def test_write_letter_into_archive(tmp_path):
+    bromley = CastleKilmereMember('Bromley Huckabee', 1959, 'male')
+    with letter_writer(LetterArchive(tmp_path / 'archive')) as archive:
+        bromley.write_letter('Luke', 'Hello Luke!')
+        bromley.write_letter('Luke', 'Hello again!')
+        assert archive.letters_to('Luke') == ['Hello Luke!', 'Hello again!']
+
+def test_empty_letters(tmp_path):
+    with LetterArchive(tmp_path) as archive:
+        archive.write('E', '')
+        assert archive.letters_to('E') == ['']
+        archive.flush()
+        assert archive.letters_to('E') == ['']
+        archive.compact()
+        assert archive.letters_to('E') == ['']
+        archive.write('E', 'Not empty')
+        assert archive.letters_to('E') == ['', 'Not empty']
+
+def test_pending_letters_are_merged_into_the_index(tmp_path):
+    with LetterArchive(tmp_path, pending_limit=3) as archive:
+        for i in range(7):
+            archive.write(f"Pupil {i % 2}", f"Letter {i}")
+        assert archive._pending_count == 1
+        assert sum(map(len, archive._runs)) == 6
+        assert archive.letters_to('Pupil 0') == ['Letter 0', 'Letter 2', 'Letter 4', 'Letter 6']
+
+def test_remove_forgets_pending_letters(archive):
+    archive.remove('Lissy')
+    assert archive.letters_to('Lissy') == []
+    assert archive._pending_count == 1
+
+def test_flushes_keep_few_index_runs(tmp_path):
+    with LetterArchive(tmp_path, pending_limit=10) as archive:
+        for i in range(1000):
+            archive.write(f"Pupil {i % 7}", f"Letter {i}")
+        assert len(archive._runs) <= 6
+        assert archive.letters_to('Pupil 3') == [f"Letter {i}" for i in range(3, 1000, 7)]
+    with LetterArchive(tmp_path) as reopened:
+        assert reopened.letters_to('Pupil 3') == [f"Letter {i}" for i in range(3, 1000, 7)]
+        assert reopened.recipients() == [f"Pupil {i}" for i in range(7)]
+
+def test_remove_applies_to_every_run(tmp_path):
+    with LetterArchive(tmp_path, pending_limit=2) as archive:
+        for i in range(9):
+            archive.write(f"Pupil {i % 3}", f"Letter {i}")
+        archive.remove('Pupil 1')
+        archive.flush()
+        assert len(archive._runs) == 1
+        assert archive.letters_to('Pupil 1') == []
+        assert archive.letters_to('Pupil 2') == ['Letter 2', 'Letter 5', 'Letter 8']
+    assert len(list(tmp_path.glob('*.run'))) == 1
+
+def test_segment_writer_in_an_archive_directory(tmp_path, archive):
+    archive.flush()
+    with SegmentLetterWriter(tmp_path) as writer:
+        writer.write('Luke', 'Hello Luke!')
+        assert writer.letters_to('Luke') == ['Hello Luke!']
+    archive.close()
+    with LetterArchive(tmp_path) as reopened:
+        assert reopened.letters_to('Lissy') == ['Hello Lissy!', 'Goodbye Lissy!']
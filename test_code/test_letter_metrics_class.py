@@ -0,0 +1,84 @@
+import threading
+import pytest
+from magical_universe import Letter, LetterMetrics, DearRecipientWriter, letter_metrics
+
+@pytest.fixture
+def metrics():
+    return LetterMetrics()
+
+def test_record_letters(metrics):
+    metrics.record_letter('Lissy', 10)
+    metrics.record_letter('Lissy', 5)
+    metrics.record_letter('Luke')
+    metrics.record_bytes(3)
+    assert metrics.letters == 3
+    assert metrics.bytes_written == 18
+    assert metrics.recipients() == {'Lissy': 2, 'Luke': 1}
+
+def test_counts_from_many_threads_are_merged(metrics):
+    def write_letters():
+        for _ in range(1000):
+            metrics.record_letter('Luke', 2)
+    threads = [threading.Thread(target=write_letters) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.letters == 8000
+    assert metrics.bytes_written == 16000
+    assert metrics.recipients()['Luke'] == 8000
+
+def test_latency_histograms(metrics):
+    metrics.record_open(0)
+    metrics.record_open(1000)
+    metrics.record_open(1023)
+    metrics.record_close(1 << 60)
+    assert metrics.open_latency() == {1: 1, 1024: 2}
+    assert metrics.close_latency() == {1 << (LetterMetrics.latency_buckets - 1): 1}
+
+def test_reset(metrics):
+    metrics.record_letter('Luke', 2)
+    metrics.record_open(10)
+    metrics.reset()
+    assert metrics.letters == 0
+    assert metrics.open_latency() == {}
+    assert metrics.recipients() == {}
+
+def test_letter_records_metrics(tmp_path):
+    before = letter_metrics.recipients()['Bromley']
+    letters = Letter.total_number_of_letters
+    with Letter(tmp_path / 'dear_Bromley.txt', 'Bromley') as letter:
+        letter.write('Hello')
+    assert Letter.total_number_of_letters == letters + 1
+    assert Letter('unused').total_number_of_letters == letters + 1
+    assert letter_metrics.recipients()['Bromley'] == before + 1
+    assert sum(letter_metrics.open_latency().values()) >= 1
+
+def test_dear_recipient_writer_passes_recipient(tmp_path):
+    before = letter_metrics.recipients()['Luke']
+    bytes_written = letter_metrics.bytes_written
+    DearRecipientWriter(tmp_path).write('Luke', 'Hello Luke!')
+    assert letter_metrics.recipients()['Luke'] == before + 1
+    assert letter_metrics.bytes_written == bytes_written + len('Hello Luke!')
+
+def test_shards_of_finished_threads_are_retired(metrics):
+    for _ in range(20):
+        thread = threading.Thread(target=metrics.record_letter, args=('Luke', 3))
+        thread.start()
+        thread.join()
+    assert len(metrics._shards) <= 1
+    assert metrics.letters == 20
+    assert metrics.bytes_written == 60
+    assert metrics.recipients() == {'Luke': 20}
+
+def test_owl_post_sessions_do_not_pile_up_shards(tmp_path):
+    import asyncio
+    from magical_universe import OwlPost
+    async def session():
+        async with OwlPost(DearRecipientWriter(tmp_path)) as owl_post:
+            for i in range(8):
+                await owl_post.send('Luke', 'Hello')
+    shards = len(letter_metrics._shards)
+    for _ in range(10):
+        asyncio.run(session())
+    assert len(letter_metrics._shards) <= shards + 1
@@ -0,0 +1,92 @@
+import os
+import subprocess
+import sys
+import time
+import pytest
+from magical_universe import (CastleKilmereMember, DearRecipientWriter, Letter,
+                              SegmentLetterWriter, letter_writer)
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+@pytest.fixture
+def bromley():
+    return CastleKilmereMember('Bromley Huckabee', 1959, 'male')
+
+def test_dear_recipient_writer(tmp_path, bromley):
+    with letter_writer(DearRecipientWriter(tmp_path)):
+        bromley.write_letter('Lissy', 'Hello Lissy!')
+        bromley.write_letter('Lissy', 'Goodbye Lissy!')
+    assert (tmp_path / 'dear_Lissy.txt').read_text() == 'Goodbye Lissy!'
+
+def test_segment_writer_keeps_every_letter(tmp_path, bromley):
+    with letter_writer(SegmentLetterWriter(tmp_path)) as writer:
+        bromley.write_letter('Lissy', 'Hello Lissy!')
+        bromley.write_letter('Luke', 'Hello Luke!')
+        bromley.write_letter('Lissy', 'Goodbye Lissy!')
+        assert writer.letters_to('Lissy') == ['Hello Lissy!', 'Goodbye Lissy!']
+    assert not list(tmp_path.glob('dear_*'))
+
+def test_segment_writer_buffers_until_flush(tmp_path):
+    writer = SegmentLetterWriter(tmp_path, flush_interval=3600)
+    writer.write('Lissy', 'Hello Lissy!')
+    assert (tmp_path / 'letters-00000.seg').read_bytes() == b''
+    writer.flush()
+    assert (tmp_path / 'letters-00000.seg').read_bytes() == b'Hello Lissy!'
+    writer.close()
+
+def test_segment_writer_flushes_on_size(tmp_path):
+    with SegmentLetterWriter(tmp_path, flush_bytes=10, flush_interval=3600) as writer:
+        writer.write('Lissy', 'Hello Lissy!')
+        assert (tmp_path / 'letters-00000.seg').read_bytes() == b'Hello Lissy!'
+
+def test_segment_writer_rolls_segments(tmp_path):
+    with SegmentLetterWriter(tmp_path, flush_bytes=1, segment_bytes=20) as writer:
+        for i in range(3):
+            writer.write('Luke', f"Letter number {i}")
+        assert writer.letters_to('Luke') == [f"Letter number {i}" for i in range(3)]
+    assert sorted(path.name for path in tmp_path.glob('*.seg')) == [
+        'letters-00000.seg', 'letters-00001.seg', 'letters-00002.seg']
+
+def test_segment_writer_appends_to_existing_directory(tmp_path):
+    with SegmentLetterWriter(tmp_path) as writer:
+        writer.write('Luke', 'First')
+    with SegmentLetterWriter(tmp_path) as writer:
+        writer.write('Luke', 'Second')
+        assert writer.letters_to('Luke') == ['First', 'Second']
+
+def test_segment_writer_counts_letters(tmp_path):
+    before = Letter.total_number_of_letters
+    with SegmentLetterWriter(tmp_path) as writer:
+        writer.write('Luke', 'Hello')
+    assert Letter.total_number_of_letters == before + 1
+
+def test_recipient_with_newline_is_rejected(tmp_path):
+    with SegmentLetterWriter(tmp_path) as writer:
+        with pytest.raises(ValueError):
+            writer.write('Luke\nLissy', 'Hello')
+
+def test_segment_writer_flushes_on_a_timer(tmp_path):
+    with SegmentLetterWriter(tmp_path, flush_interval=0.05) as writer:
+        writer.write('Lissy', 'Hello Lissy!')
+        deadline = time.monotonic() + 5
+        while not (tmp_path / 'letters-00000.seg').read_bytes() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert (tmp_path / 'letters-00000.seg').read_bytes() == b'Hello Lissy!'
+        assert (tmp_path / 'letters.idx').read_text() == '0 0 12 Lissy\n'
+
+def test_segment_writer_is_flushed_at_exit(tmp_path):
+    script = (f"import sys; sys.path.insert(0, {ROOT!r})\n"
+              "from magical_universe import CastleKilmereMember, SegmentLetterWriter, set_letter_writer\n"
+              f"set_letter_writer(SegmentLetterWriter({str(tmp_path)!r}, flush_interval=3600))\n"
+              "CastleKilmereMember('Bromley Huckabee', 1959, 'male').write_letter('Lissy', 'Hello Lissy!')\n")
+    subprocess.run([sys.executable, '-c', script], check=True)
+    assert (tmp_path / 'letters-00000.seg').read_bytes() == b'Hello Lissy!'
+
+def test_close_twice(tmp_path):
+    writer = SegmentLetterWriter(tmp_path)
+    writer.write('Luke', 'Hello')
+    writer.close()
+    writer.close()
+    writer.flush()
+    assert (tmp_path / 'letters-00000.seg').read_bytes() == b'Hello'
+
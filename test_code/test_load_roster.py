@@ -0,0 +1,57 @@
+import os
+import pytest
+from magical_universe import CastleKilmereMember, Pupil, Professor, Ghost, load_roster
+
+yaml = pytest.importorskip('yaml')
+
+CONFIG = os.path.join(os.path.dirname(__file__), '..', 'config.yaml')
+
+ROSTER = """\
+- type: professor
+  name: Blade Bardock
+  birthyear: 1988
+  sex: male
+  subject: Potions
+- type: ghost
+  name: The Gray Groom
+  birthyear: 1000
+  sex: male
+  year_of_death: 1050
+---
+type: Pupil
+name: Luke Bery
+birthyear: 2008
+sex: male
+start_year: 2020
+traits:
+  evil: true
+  kind: false
+---
+"""
+
+def test_load_config_yaml():
+    roster = load_roster(CONFIG, cache=False)
+    assert [row.name for row in roster] == ['Bromley Huckabee', 'Luke Bery', 'Lissy Spinster']
+    assert [row.kind for row in roster] == [CastleKilmereMember, Pupil, Pupil]
+    assert roster[1].start_year == 2020
+
+def test_load_typed_documents(tmp_path):
+    path = tmp_path / 'roster.yaml'
+    path.write_text(ROSTER)
+    roster = load_roster(path)
+    assert [row.kind for row in roster] == [Professor, Ghost, Pupil]
+    assert roster[0].subject == 'Potions'
+    assert roster[1].year_of_death == 1050
+    assert roster[2].exhibits_trait('evil')
+    assert not roster[2].exhibits_trait('kind')
+
+def test_load_into_existing_roster(tmp_path):
+    roster = load_roster(CONFIG, cache=False)
+    load_roster(CONFIG, roster, cache=False)
+    assert len(roster) == 6
+
+def test_unknown_type_is_rejected(tmp_path):
+    path = tmp_path / 'roster.yaml'
+    path.write_text("type: dragon\nname: Norbert\nbirthyear: 1990\nsex: male\n")
+    with pytest.raises(ValueError):
+        load_roster(path)
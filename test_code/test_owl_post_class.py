@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from magical_universe import (CastleKilmereMember, DearRecipientWriter, OwlPost, LetterWriter,
+                              SegmentLetterWriter, letter_writer)
+
+@pytest.fixture
+def bromley():
+    return CastleKilmereMember('Bromley Huckabee', 1959, 'male')
+
+class SlowWriter(LetterWriter):
+    def __init__(self):
+        self.letters = []
+        self.flushed = False
+
+    def write(self, recipient, content):
+        self.letters.append((recipient, content))
+
+    def flush(self):
+        self.flushed = True
+
+class BrokenWriter(LetterWriter):
+    def write(self, recipient, content):
+        raise OSError("the owl got lost")
+
+def test_awrite_letter_through_owl_post(tmp_path, bromley):
+    async def main(writer):
+        async with OwlPost(writer):
+            await asyncio.gather(*(bromley.awrite_letter('Lissy', f"Letter {i}") for i in range(100)))
+    with SegmentLetterWriter(tmp_path) as writer:
+        asyncio.run(main(writer))
+        letters = writer.letters_to('Lissy')
+    assert sorted(letters) == sorted(f"Letter {i}" for i in range(100))
+
+def test_awrite_letter_without_owl_post(tmp_path, bromley):
+    async def main():
+        await bromley.awrite_letter('Lissy', 'Hello Lissy!')
+    with letter_writer(DearRecipientWriter(tmp_path)):
+        asyncio.run(main())
+    assert (tmp_path / 'dear_Lissy.txt').read_text() == 'Hello Lissy!'
+
+def test_close_delivers_queued_letters_and_flushes():
+    writer = SlowWriter()
+    async def main():
+        owl_post = OwlPost(writer, owls=2, max_pending=5)
+        futures = [await owl_post.send('Luke', f"Letter {i}") for i in range(20)]
+        await owl_post.close()
+        return futures
+    futures = asyncio.run(main())
+    assert all(future.result() == 'Luke' for future in futures)
+    assert len(writer.letters) == 20
+    assert writer.flushed
+
+def test_send_waits_while_queue_is_full():
+    async def main():
+        owl_post = OwlPost(SlowWriter(), owls=1, max_pending=2)
+        for i in range(2):
+            await owl_post.send('Luke', 'Hello')
+        assert owl_post.pending == 2
+        await owl_post.close()
+        assert owl_post.pending == 0
+    asyncio.run(main())
+
+def test_failed_delivery_sets_exception():
+    async def main():
+        async with OwlPost(BrokenWriter()) as owl_post:
+            delivered = await owl_post.send('Luke', 'Hello')
+            with pytest.raises(OSError):
+                await delivered
+    asyncio.run(main())
+
+def test_send_after_close_is_refused():
+    async def main():
+        owl_post = OwlPost(SlowWriter())
+        await owl_post.close()
+        with pytest.raises(RuntimeError):
+            await owl_post.send('Luke', 'Hello')
+    asyncio.run(main())
@@ -1,5 +1,6 @@
 import pytest
-from magical_universe import Potion
+from collections import Counter
+from magical_universe import Potion, IngredientVocabulary, shopping_list, parallel_shopping_list
 
 @pytest.fixture
 def flask_of_remembrance():
@@ -16,3 +17,46 @@ def test_iterator_behavior(flask_of_remembrance):
                                     'dried onions', 'powdered ginger root']
 
 
+def test_shopping_list(flask_of_remembrance, vial_of_anger):
+    potions = [flask_of_remembrance, vial_of_anger, Potion(['leeches', 'unicorn tears'])]
+    expected = Counter()
+    for potion in potions:
+        expected.update(potion.ingredients)
+    assert shopping_list(potions) == expected
+    assert shopping_list(potions)['leeches'] == 2
+
+def test_shopping_list_streams_generators_in_chunks():
+    potions = (Potion(['leeches', 'unicorn tears'] if i % 2 else ['leeches']) for i in range(10))
+    assert shopping_list(potions, chunk_size=3) == Counter({'leeches': 10, 'unicorn tears': 5})
+
+def test_shopping_list_of_no_potions():
+    assert shopping_list(iter([])) == Counter()
+
+def test_ingredient_vocabulary():
+    vocabulary = IngredientVocabulary()
+    assert list(vocabulary.ids(['leeches', 'unicorn tears', 'leeches'])) == [0, 1, 0]
+    assert vocabulary.name(1) == 'unicorn tears'
+    assert 'leeches' in vocabulary
+    assert len(vocabulary) == 2
+
+def test_potion_can_be_iterated_again(flask_of_remembrance):
+    assert list(flask_of_remembrance) == list(flask_of_remembrance)
+    assert len(flask_of_remembrance) == 5
+
+def test_independent_iterations(vial_of_anger):
+    first, second = iter(vial_of_anger), iter(vial_of_anger)
+    assert next(first) == 'dried dragon skin'
+    assert next(first) == 'leeches'
+    assert next(second) == 'dried dragon skin'
+
+def test_parallel_shopping_list_equals_serial(flask_of_remembrance, vial_of_anger):
+    potions = [flask_of_remembrance, vial_of_anger, Potion(['leeches'])] * 50
+    assert parallel_shopping_list(potions, workers=2, chunk_size=7) == shopping_list(potions)
+
+def test_parallel_shopping_list_of_no_potions():
+    assert parallel_shopping_list([], workers=1) == Counter()
+
+def test_parallel_shopping_list_of_a_generator(flask_of_remembrance, vial_of_anger):
+    potions = [flask_of_remembrance, vial_of_anger, Potion(['leeches'])] * 50
+    assert (parallel_shopping_list(iter(potions), workers=2, chunk_size=7)
+            == shopping_list(potions))
@@ -1,6 +1,6 @@
 import pytest
 import datetime
-from magical_universe import Pupil, Charm, Transfiguration, Hex, Curse, Jinx, HealingSpell, CounterSpell
+from magical_universe import Pupil, Charm, Transfiguration, Hex, Curse, Jinx, HealingSpell, CounterSpell, grade_cohort
 
 now = datetime.datetime.now().year
 
@@ -194,3 +194,42 @@ def test_cast_spell_curse(capfd, luke, fiera_satanotis):
 def test_cast_known_spell(capfd, luke, stuporus_ratiato):
     luke.learn_spell(stuporus_ratiato)
     assert luke.cast_spell(stuporus_ratiato) == 'Luke Bery: Stuporus Ratiato!'
+
+def test_elms_view_is_live(luke):
+    elms = luke.elms
+    luke.elms = ("Charms", "E")
+    assert elms['Charms'] == True
+    elms['Potions'] = True
+    assert luke.elms['Potions'] == True
+    assert len(elms) == 10
+
+def test_set_elms_with_unknown_subject_raises_KeyError(luke):
+    with pytest.raises(KeyError):
+        luke.elms = ("Quidditch", "E")
+
+def test_grade_cohort(capfd, luke, lissy, adrien):
+    awarded = grade_cohort([luke, lissy, adrien], 'Potions', ['E', 'Horrible', 'Acceptable'])
+    stdout, err = capfd.readouterr()
+    assert stdout == ''
+    assert awarded == 2
+    assert [p.elms['Potions'] for p in (luke, lissy, adrien)] == [True, False, True]
+    assert luke.elms['Charms'] == False
+
+def test_grade_cohort_requires_one_grade_per_pupil(luke, lissy):
+    with pytest.raises(ValueError):
+        grade_cohort([luke, lissy], 'Potions', ['E'])
+
+def test_hex_subclasses_are_treated_as_hexes(capfd, luke):
+    class MinorHex(Hex):
+        pass
+    minor_hex = MinorHex('The Minor hex', 'Minoro', 'Itches')
+    luke.learn_spell(minor_hex)
+    luke.cast_spell(minor_hex)
+    stdout, err = capfd.readouterr()
+    assert stdout.splitlines() == ['How dare you study a hex or curse?!',
+                                   "You shouldn't cast a hex, that's mean!"]
+
+def test_known_spells_deduplicate_equal_spells(luke):
+    luke.learn_spell(Charm.stuporus_ratiato())
+    luke.learn_spell(Charm('The Stuporus Ratiato charm', 'Stuporus Ratiato', 'Makes objects fly'))
+    assert len(luke.known_spells) == 1
@@ -0,0 +1,52 @@
+import pytest
+from magical_universe import Potion, RecipeIndex, IngredientVocabulary
+
+@pytest.fixture
+def flask_of_remembrance():
+    return Potion(['raven eggshells', 'tincture of thyme', 'unicorn tears',
+                   'dried onions', 'powdered ginger root'])
+
+@pytest.fixture
+def vial_of_anger():
+    return Potion(['dried dragon skin', 'leeches', 'shredded elephant tusk',
+                   'horned flies', 'earthworm juice'])
+
+@pytest.fixture
+def ancient_wisdom():
+    return Potion(['tincture of thyme', 'unicorn tears', 'raven eggshells',
+                   'dried onions', 'leeches'])
+
+@pytest.fixture
+def index(flask_of_remembrance, vial_of_anger, ancient_wisdom):
+    return RecipeIndex([flask_of_remembrance, vial_of_anger, ancient_wisdom],
+                       vocabulary=IngredientVocabulary())
+
+def test_identical_recipes_are_deduplicated(index, flask_of_remembrance):
+    reordered = Potion(list(reversed(flask_of_remembrance.ingredients)) + ['unicorn tears'])
+    assert index.add(reordered) == 0
+    assert len(index) == 3
+    assert index.potions(0) == [flask_of_remembrance, reordered]
+    assert index.duplicates() == [[flask_of_remembrance, reordered]]
+    assert reordered in index
+
+def test_recipe_names(index):
+    assert index.recipe(1) == ['dried dragon skin', 'earthworm juice', 'horned flies',
+                               'leeches', 'shredded elephant tusk']
+
+def test_sharing_at_least_k_ingredients(index, ancient_wisdom):
+    assert index.sharing(ancient_wisdom, k=4) == [2, 0]
+    assert index.sharing(ancient_wisdom, k=1) == [2, 0, 1]
+    assert index.sharing(Potion(['bat wings']), k=1) == []
+
+def test_similar_recipes(index, ancient_wisdom):
+    similar = index.similar(ancient_wisdom, k=2)
+    assert similar[0] == (2, 1.0)
+    assert similar[1] == (0, pytest.approx(4 / 6))
+
+def test_similar_with_unknown_ingredients(index):
+    assert index.similar(Potion(['bat wings'])) == []
+    assert Potion(['bat wings']) not in index
+
+def test_num_hashes_must_split_into_bands():
+    with pytest.raises(ValueError):
+        RecipeIndex(num_hashes=10, bands=4)
@@ -0,0 +1,73 @@
+import pytest
+import datetime
+from magical_universe import (Roster, RosterRow, CastleKilmereMember, Pupil, Professor, Ghost,
+                              ages, current_years)
+
+now = datetime.datetime.now().year
+
+@pytest.fixture
+def members():
+    return [CastleKilmereMember('Bromley Huckabee', 1959, 'male'),
+            Pupil.luke(),
+            Professor.blade(),
+            Ghost.mocking_knight()]
+
+@pytest.fixture
+def roster(members):
+    return Roster(members)
+
+def test_length(roster):
+    assert len(roster) == 4
+
+def test_rows_are_views(roster):
+    assert isinstance(roster[0], RosterRow)
+    assert roster[-1].name == 'The Mocking Knight'
+
+def test_index_out_of_range_raises_exception(roster):
+    with pytest.raises(IndexError):
+        roster[4]
+
+def test_repr_matches_members(roster, members):
+    assert [repr(row) for row in roster] == [repr(member) for member in members]
+
+def test_says(roster):
+    assert roster[0].says("Hi Lissy!") == "Bromley Huckabee says: Hi Lissy!"
+
+def test_age_and_current_year(roster):
+    assert roster[0].age == (now - 1959)
+    assert roster[1].current_year == (now - 2020 + 1)
+
+def test_attributes_of_other_classes_raise_exception(roster):
+    with pytest.raises(AttributeError):
+        roster[0].start_year
+    with pytest.raises(AttributeError):
+        roster[1].year_of_death
+
+def test_to_member(roster):
+    blade = roster[2].to_member()
+    assert isinstance(blade, Professor)
+    assert repr(blade) == repr(Professor.blade())
+
+def test_columns(roster):
+    assert list(roster.column('birthyears')) == [1959, 2008, 1988, 1401]
+    with pytest.raises(TypeError):
+        roster.column('birthyears')[0] = 2000
+    with pytest.raises(ValueError):
+        roster.column('names')
+
+def test_rows_of_kind(roster):
+    assert [row.name for row in roster.rows_of(Pupil)] == ['Luke Bery']
+    assert roster.count(Ghost) == 1
+
+def test_ages_match_age_property(roster, members):
+    assert list(ages(members)) == [member.age for member in members]
+    assert list(ages(roster)) == [member.age for member in members]
+
+def test_ages_as_of(members):
+    assert list(ages(members, as_of=2000)) == [41, -8, 12, 599]
+
+def test_current_years_match_property(roster, members):
+    pupils = [Pupil.luke(), Pupil('Lissy Spinster', 2008, 'female', 2022)]
+    assert list(current_years(pupils)) == [pupil.current_year for pupil in pupils]
+    assert list(current_years(roster)) == [members[1].current_year]
+    assert list(current_years(pupils, as_of=2024)) == [5, 3]
@@ -0,0 +1,50 @@
+import pytest
+import datetime
+from magical_universe import SchoolClock, school_clock, CastleKilmereMember, Pupil, Department, Professor
+
+now = datetime.datetime.now().year
+
+@pytest.fixture
+def clock():
+    return SchoolClock()
+
+@pytest.fixture
+def luke():
+    return Pupil.luke()
+
+def test_unpinned_clock_reads_current_year(clock):
+    assert clock.year == now
+    assert not clock.pinned
+
+def test_pin_and_unpin(clock):
+    clock.pin(1990)
+    assert clock.pinned
+    assert clock.year == 1990
+    clock.unpin()
+    assert clock.year == now
+
+def test_pin_defaults_to_current_year(clock):
+    clock.pin()
+    assert clock.year == now
+
+def test_context_manager_restores_previous_year(clock):
+    clock.pin(2000)
+    with clock(year=2026) as year:
+        assert year == 2026
+        assert clock.year == 2026
+    assert clock.year == 2000
+
+def test_properties_read_the_school_clock(luke):
+    bromley = CastleKilmereMember('Bromley Huckabee', 1959, 'male')
+    department = Department('Department of Science', Professor.blade(), 1990)
+    with school_clock(year=2026):
+        assert bromley.age == 67
+        assert luke.current_year == 7
+        assert department.current_age() == 37
+    assert not school_clock.pinned
+
+def test_context_manager_restores_on_exception():
+    with pytest.raises(RuntimeError):
+        with school_clock(year=1500):
+            raise RuntimeError
+    assert school_clock.year == now
@@ -0,0 +1,103 @@
+import pytest
+import random
+from magical_universe import (SpellCatalog, Charm, Transfiguration, Hex, Curse, Jinx,
+                              HealingSpell, CounterSpell, IncantationMatcher, canonical_spells)
+
+@pytest.fixture
+def catalog():
+    return SpellCatalog.standard()
+
+def test_standard_catalog_holds_canonical_spells(catalog):
+    assert len(catalog) == 8
+    assert Charm.liberula() in catalog
+    assert set(canonical_spells(Charm)) == {Charm.stuporus_ratiato(), Charm.liberula()}
+
+def test_exact_lookup(catalog):
+    assert catalog['Stuporus Ratiato'] is Charm.stuporus_ratiato()
+    assert catalog['porim  PERFITE'] is HealingSpell.porim_perfite()
+    assert catalog.get('Abracadabra') is None
+
+def test_unknown_incantation_raises_KeyError(catalog):
+    with pytest.raises(KeyError):
+        catalog['Abracadabra']
+
+def test_adding_a_spell_twice(catalog):
+    catalog.add(Charm('The Liberula charm', 'Liberula', 'Allows a person to breath under water',
+                      'Difficult', 5))
+    assert len(catalog) == 8
+
+def test_spells_sharing_an_incantation(catalog):
+    loud = Charm('The loud Liberula charm', 'Liberula', 'Makes bubbles')
+    catalog.add(loud)
+    assert catalog['Liberula'] is Charm.liberula()
+    assert catalog.all_with_incantation('Liberula') == [Charm.liberula(), loud]
+
+def test_prefix_search(catalog):
+    catalog.add(Charm('The Porim charm', 'Porim', 'Opens pores'))
+    assert catalog.complete('po') == ['Porim', 'Porim Perfite']
+    assert catalog.starting_with('Porim P') == [HealingSpell.porim_perfite()]
+    assert catalog.starting_with('x') == []
+    assert catalog.complete('', limit=2) == ['Alteraro Canieo', 'Fiera Satanotis']
+
+def test_secondary_indexes(catalog):
+    assert catalog.with_difficulty('Medium') == []
+    assert set(catalog.with_difficulty('Simple')) == {Charm.stuporus_ratiato(),
+                                                      Transfiguration.alteraror_canieo(),
+                                                      Jinx.inceptotis(),
+                                                      CounterSpell.mufindo_immolim()}
+    assert catalog.with_min_year(None) == [Hex.rectaro()]
+    assert catalog.with_min_year(6) == [Curse.fiera_satanotis()]
+    assert len(catalog.learnable_in(5)) == 6
+
+def test_adding_keeps_sorted_indexes_up_to_date(catalog):
+    for year, incantation in [(2, 'Zeta'), (9, 'Aqua'), (4, 'Mora Mora')]:
+        spell = Charm(f'The {incantation} charm', incantation, 'Does something', min_year=year)
+        catalog.add(spell)
+        assert catalog.complete(incantation) == [incantation]
+        assert spell in catalog.learnable_in(year)
+    assert catalog._sorted_incantations == sorted(catalog._by_incantation)
+    assert catalog._sorted_min_years == sorted(year for year in catalog._by_min_year if year is not None)
+
+def test_fuzzy_matches_misspelled_incantations(catalog):
+    (spell, score), = catalog.fuzzy('Mufindo Imolim', k=1)
+    assert spell is CounterSpell.mufindo_immolim()
+    assert 0.4 < score < 1
+    assert catalog.fuzzy('alteraro kanieo', k=1)[0][0] is Transfiguration.alteraror_canieo()
+
+def test_fuzzy_exact_match_scores_one(catalog):
+    assert catalog.fuzzy('Rectaro', k=1) == [(Hex.rectaro(), 1.0)]
+
+def test_fuzzy_returns_nothing_for_unrelated_input(catalog):
+    assert catalog.fuzzy('Xyzzy') == []
+
+def test_fuzzy_sees_spells_added_later(catalog):
+    catalog.fuzzy('Liberula')
+    spell = Charm('The Lumos charm', 'Lumosa Maxima', 'Lights up')
+    catalog.add(spell)
+    assert catalog.fuzzy('Lumossa Maxima', k=1)[0][0] is spell
+
+def test_incantation_matcher_ranks_by_similarity():
+    matcher = IncantationMatcher(['porim perfite', 'porim', 'perfite'])
+    assert [match for match, score in matcher.match('porim perfit')] == ['porim perfite', 'porim', 'perfite']
+    assert len(matcher) == 3
+
+def dice(query, incantation):
+    grams, other = IncantationMatcher.trigrams(query), IncantationMatcher.trigrams(incantation)
+    return 2 * len(grams & other) / (len(grams) + len(other))
+
+def test_incantation_matcher_keeps_matches_at_the_boundary():
+    matcher = IncantationMatcher(['cac', 'porim'])
+    assert dice('c cac', 'cac') == 0.8
+    assert matcher.match('c cac', min_score=0.8) == [('cac', 0.8)]
+
+@pytest.mark.parametrize("min_score", [0.3, 0.4, 0.5, 0.6, 0.8])
+def test_incantation_matcher_agrees_with_brute_force(min_score):
+    rng = random.Random(7)
+    incantations = {''.join(rng.choice('ac ') for _ in range(rng.randint(1, 6))).strip() or 'a'
+                    for _ in range(300)}
+    matcher = IncantationMatcher(incantations)
+    for _ in range(200):
+        query = ''.join(rng.choice('ac ') for _ in range(rng.randint(1, 6)))
+        expected = {(incantation, score) for incantation in incantations
+                    for score in [dice(query, incantation)] if score >= min_score}
+        assert set(matcher.match(query, k=len(incantations), min_score=min_score)) == expected
@@ -0,0 +1,60 @@
+import pytest
+from magical_universe import TraitIndex, CastleKilmereMember, Pupil
+
+@pytest.fixture
+def bromley():
+    bromley = CastleKilmereMember('Bromley Huckabee', 1959, 'male')
+    bromley.add_trait('kind')
+    return bromley
+
+@pytest.fixture
+def lissy():
+    lissy = Pupil.lissy()
+    lissy.add_trait('kind')
+    lissy.add_trait('highly intelligent')
+    return lissy
+
+@pytest.fixture
+def luke():
+    luke = Pupil.luke()
+    luke.add_trait('evil')
+    return luke
+
+@pytest.fixture
+def index(bromley, lissy, luke):
+    return TraitIndex([bromley, lissy, luke])
+
+def test_existing_traits_are_indexed(index, bromley, lissy):
+    assert index.query(all_of=['kind']) == [bromley, lissy]
+
+def test_add_trait_updates_index(index, luke, lissy):
+    luke.add_trait('highly intelligent')
+    assert index.query(all_of=['highly intelligent']) == [lissy, luke]
+    lissy.add_trait('highly intelligent', False)
+    assert index.query(all_of=['highly intelligent']) == [luke]
+
+def test_boolean_queries(index, bromley, lissy, luke):
+    assert index.query(all_of=['kind'], none_of=['highly intelligent']) == [bromley]
+    assert index.query(any_of=['evil', 'highly intelligent']) == [lissy, luke]
+    assert index.query(none_of=['kind']) == [luke]
+    assert index.query() == [bromley, lissy, luke]
+
+def test_unknown_traits(index, bromley, lissy, luke):
+    assert index.query(all_of=['a trait nobody has ever had']) == []
+    assert index.count(none_of=['a trait nobody has ever had']) == 3
+
+def test_count_and_ids(index):
+    assert index.count(all_of=['kind']) == 2
+    assert index.ids(all_of=['kind']) == 0b011
+
+def test_remove(index, bromley, lissy):
+    index.remove(bromley)
+    assert bromley not in index
+    assert len(index) == 2
+    assert index.query(all_of=['kind']) == [lissy]
+    bromley.add_trait('evil')
+    assert index.count(all_of=['evil']) == 1
+
+def test_member_can_only_be_in_one_index(index, bromley):
+    with pytest.raises(ValueError):
+        TraitIndex([bromley])
@@ -0,0 +1,66 @@
+import pytest
+from magical_universe import (TraitVocabulary, CastleKilmereMember, Pupil, Roster,
+                              trait_vocabulary, members_with_traits)
+
+@pytest.fixture
+def vocabulary():
+    return TraitVocabulary()
+
+@pytest.fixture
+def members():
+    bromley = CastleKilmereMember('Bromley Huckabee', 1959, 'male')
+    bromley.add_trait('kind')
+    lissy = Pupil.lissy()
+    lissy.add_trait('kind')
+    lissy.add_trait('highly intelligent')
+    luke = Pupil.luke()
+    luke.add_trait('kind')
+    luke.add_trait('evil')
+    return [bromley, lissy, luke]
+
+def test_bits_are_interned(vocabulary):
+    assert vocabulary.bit('kind') == 1
+    assert vocabulary.bit('evil') == 2
+    assert vocabulary.bit('kind') == 1
+    assert len(vocabulary) == 2
+
+def test_lookup_does_not_add_traits(vocabulary):
+    assert vocabulary.lookup('smart') == 0
+    assert 'smart' not in vocabulary
+
+def test_mask_and_traits(vocabulary):
+    mask = vocabulary.bit('kind') | vocabulary.bit('wild')
+    assert vocabulary.mask(['kind', 'wild']) == mask
+    assert vocabulary.mask(['kind', 'unheard of']) == 0
+    assert vocabulary.traits(mask) == ['kind', 'wild']
+
+def test_probing_unknown_traits_does_not_grow_memory():
+    bromley = CastleKilmereMember('Bromley Huckabee', 1959, 'male')
+    size = len(trait_vocabulary)
+    assert bromley.exhibits_trait('a trait nobody has ever had') == False
+    assert len(trait_vocabulary) == size
+    assert bromley._traits == {}
+
+def test_overwriting_a_trait(capfd):
+    bromley = CastleKilmereMember('Bromley Huckabee', 1959, 'male')
+    bromley.add_trait('kind')
+    bromley.add_trait('kind', False)
+    assert bromley._traits == {'kind': False}
+    bromley.print_traits()
+    stdout, err = capfd.readouterr()
+    assert stdout.strip() == 'Bromley Huckabee is not kind.'
+
+def test_members_with_traits(members):
+    names = [m.name for m in members_with_traits(members, all_of=['kind'], none_of=['evil'])]
+    assert names == ['Bromley Huckabee', 'Lissy Spinster']
+
+def test_members_with_unknown_trait(members):
+    assert list(members_with_traits(members, all_of=['a trait nobody has ever had'])) == []
+    assert len(list(members_with_traits(members, none_of=['a trait nobody has ever had']))) == 3
+
+def test_members_with_traits_in_roster(members):
+    roster = Roster(members)
+    rows = members_with_traits(roster, all_of=['kind', 'highly intelligent'])
+    assert [row.name for row in rows] == ['Lissy Spinster']
+    assert roster[2].exhibits_trait('evil') == True
+    assert roster[2].to_member().exhibits_trait('evil') == True